@@ -10,7 +10,6 @@
 # TODO: revamp status to give the SoC at the beginning and end of the current time step
 # TODO: simplify scheduling to the net energy activity of the battery (assuming constant power, within max bounds)
 # TODO: add functions to check schedule
-# TODO: at some point make sure all user submitted time intervals are evenly divisible by round duration
 
 class Storage:
     """This is an idealized battery model to emulate a Li-ion or Li-Po battery
@@ -20,15 +19,15 @@ class Storage:
     # battery control is scheduled as net charge for the time interval
     # positive charge = charge
     # negative charge = discharge
-    # schedule is a dictionary. Key is the timestamp intervals (unix time) as a tuple
+    # schedule is a dictionary. Key is the step of the time interval (see utils.time_step)
     # value of key is a list. first element in list is charge. second element in list is discharge
     # net energy is physically limited
     # for fixed interval market timings this should temporally align.
     # a bit more work needs to be put in to make scheduling more dynamic
     # example:
     # self.__schedule = {
-    #     (0, 60): 50,
-    #     (60, 120): -50
+    #     0: 50,
+    #     1: -50
     # }
 
     # efficiency is one way efficiency. Round trip efficiency is efficiecy^2
@@ -79,26 +78,14 @@ class Storage:
             return (soc_start, current_energy_activity, soc_end)
         return (soc_start, current_energy_activity, round(soc_end, 2))
 
-    # Check that time interval is a multiple of time durations
-    def __time_interval_is_valid(self, time_interval: tuple):
-        # print(self.timing)
-        duration = self.timing['duration']
-        if (time_interval[1] - time_interval[0]) % duration != 0:
-            # make sure duration is a multiple of round duration
-            return False
-        if time_interval[0] % duration != 0:
-            return False
-        if time_interval[1] % duration != 0:
-            return False
-        return True
-
     # Check scheduled battery charge or discharge
-    async def check_schedule(self, time_interval: tuple):
-        if not self.__time_interval_is_valid(time_interval):
-            print('invalid interval')
+    async def check_schedule(self, time_interval: int):
+        if self.timing.get('current_round') is None:
             return False
 
-        if self.timing['current_round'][0] is None:
+        # only the current and future time intervals can be scheduled
+        if time_interval < self.timing['current_round']:
+            print('invalid interval')
             return False
 
         round_duration = self.timing['duration']
@@ -106,38 +93,30 @@ class Storage:
         schedule = {}
 
         # charge cap and discharge cap are at the meter
-        elapse_blocks = int((time_interval[1] - self.timing['current_round'][0]) / round_duration)
-        elapse_intervals = [(self.timing['current_round'][0] + s * round_duration,
-                             self.timing['current_round'][0] + (s + 1) * round_duration) for s in range(elapse_blocks)]
-        request_intervals = elapse_intervals[
-                        elapse_intervals.index((time_interval[0], time_interval[0] + round_duration)):]
-
-        request_blocks = len(request_intervals)
+        # the projection includes everything scheduled from the current round to the requested interval
+        elapse_keys = range(self.timing['current_round'], time_interval + 1)
         soc_start = self.__info['state_of_charge']
-        for idx in range(request_blocks):
-            elapse_keys = elapse_intervals[:elapse_intervals.index(request_intervals[idx]) + 1]
-            elapsed_and_scheduled = {key: self.__schedule[key] for key in elapse_keys if key in self.__schedule}
-            total_scheduled_use = sum(elapsed_and_scheduled.values())
-            projected_self_discharge = len(elapse_keys) * self.__info['self_discharge_rate_min']
-            projected_energy = max(0, min(self.__info['capacity'],
-                                       soc_start + total_scheduled_use - projected_self_discharge))
-            charge_cap = (self.__info['capacity'] - projected_energy) / self.__info['efficiency']  # at the meter
-            discharge_cap = projected_energy * self.__info['efficiency']  # at the meter
-
-            max_charge = min(charge_cap, meter_potential)
-            max_discharge = min(discharge_cap, meter_potential)
-            scheduled_step = self.__schedule[request_intervals[idx]] if request_intervals[idx] in self.__schedule else 0
-
-            schedule[request_intervals[idx]] = {
-                'energy_potential': (-int(max_discharge), int(max_charge)),
-                'projected_energy_end': round(projected_energy, 2),
-                'projected_soc_end': round(projected_energy/self.__info['capacity'], 2),
-                'energy_scheduled': scheduled_step
-            }
+        total_scheduled_use = sum(self.__schedule[key] for key in elapse_keys if key in self.__schedule)
+        projected_self_discharge = len(elapse_keys) * self.__info['self_discharge_rate_min']
+        projected_energy = max(0, min(self.__info['capacity'],
+                                   soc_start + total_scheduled_use - projected_self_discharge))
+        charge_cap = (self.__info['capacity'] - projected_energy) / self.__info['efficiency']  # at the meter
+        discharge_cap = projected_energy * self.__info['efficiency']  # at the meter
+
+        max_charge = min(charge_cap, meter_potential)
+        max_discharge = min(discharge_cap, meter_potential)
+        scheduled_step = self.__schedule[time_interval] if time_interval in self.__schedule else 0
+
+        schedule[time_interval] = {
+            'energy_potential': (-int(max_discharge), int(max_charge)),
+            'projected_energy_end': round(projected_energy, 2),
+            'projected_soc_end': round(projected_energy/self.__info['capacity'], 2),
+            'energy_scheduled': scheduled_step
+        }
         return schedule
 
     # Schedule for buying or selling of energy at given time interval
-    async def schedule_energy(self, energy: int, time_interval: tuple):
+    async def schedule_energy(self, energy: int, time_interval: int):
         """Function used to schedule charge or discharge
 
         # energy is the amount to be charged or discharged in Wh
@@ -148,14 +127,11 @@ class Storage:
 
         Args:
             energy (int): [description]
-            time_interval (tuple): [description]
+            time_interval (int): step of the time interval
 
         Returns:
             [type]: [description]
         """
-        if not self.__time_interval_is_valid(time_interval):
-            return False
-
         # TODO: only deal with intervals of 60s for now.
         if energy == 0:
             self.__schedule.pop(time_interval, None)
@@ -0,0 +1,124 @@
+import numpy as np
+
+from TREX_Core.markets.base.DoubleAuction import Market as BaseMarket
+from TREX_Core.markets.base.Records import Order
+
+
+def clearing_price(bid_prices, bid_quantities, ask_prices, ask_quantities):
+    """Finds the intersection of the aggregated demand and supply curves
+
+    Bids must be sorted by decreasing price and asks by increasing price.
+    The cleared volume is the largest quantity that can be traded at a single price.
+    If a range of prices clears the same volume, the middle of the range is used.
+
+    Returns
+    -------
+    tuple
+        cleared volume and clearing price. The price is None if nothing clears
+    """
+    prices = np.union1d(bid_prices, ask_prices)
+    # demand at p is the quantity bid at p or higher, supply at p is the quantity asked at p or lower
+    demand = np.concatenate(([0], np.cumsum(bid_quantities)))[
+        np.searchsorted(-bid_prices, -prices, side='right')]
+    supply = np.concatenate(([0], np.cumsum(ask_quantities)))[
+        np.searchsorted(ask_prices, prices, side='right')]
+    volume = np.minimum(demand, supply)
+    cleared = int(volume.max())
+    if cleared <= 0:
+        return 0, None
+
+    best = np.flatnonzero(volume == cleared)
+    return cleared, float(prices[best[0]] + prices[best[-1]]) / 2
+
+
+def allocate(prices, quantities, volume):
+    """Allocates the cleared volume to one side of the book, in order of price priority
+
+    Price levels are filled completely until the marginal level, which is shared pro-rata to the quantities.
+    Allocations are whole Wh; rounding remainders go to the largest fractions, then to the earliest orders.
+    """
+    allocation = np.zeros_like(quantities)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(prices)) + 1))
+    ends = np.append(starts[1:], len(prices))
+    level_totals = np.add.reduceat(quantities, starts)
+    filled_levels = np.cumsum(level_totals)
+
+    marginal = int(np.searchsorted(filled_levels, volume))
+    start = starts[marginal]
+    end = ends[marginal]
+    allocation[:start] = quantities[:start]
+
+    remaining = volume - (filled_levels[marginal - 1] if marginal else 0)
+    shares = quantities[start:end] * remaining / level_totals[marginal]
+    level_allocation = np.floor(shares).astype(quantities.dtype)
+    leftover = int(remaining - level_allocation.sum())
+    if leftover:
+        level_allocation[np.argsort(level_allocation - shares, kind='stable')[:leftover]] += 1
+    allocation[start:end] = level_allocation
+    return allocation
+
+
+class Market(BaseMarket):
+    """Uniform price call auction for TREX
+
+    Bids and asks are submitted for delivery time slots in the same way as MicroTE3B.
+    When a slot closes, it is cleared at a single price, where the aggregated demand and supply curves intersect.
+    Bids and asks better than the clearing price are filled completely and the marginal price level is allocated
+    pro-rata. The allocations are then paired off in order of price priority, so each slot produces
+    O(bids + asks) settlements, instead of one partial match for every crossing bid/ask pair.
+
+    Buyers and sellers both settle at the clearing price.
+    Quantities a participant would trade with itself are not settled.
+
+    """
+
+    def __init__(self, market_id, **kwargs):
+        # a call auction only clears when the slot closes
+        kwargs.pop('continuous_matching', None)
+        super().__init__(market_id, **kwargs)
+
+    # both classes are named Market, so this replaces the pairwise matching of the base double auction
+    async def __match(self, time_delivery):
+        """Clears a time slot at a uniform price
+
+        Parameters
+        ----------
+        time_delivery : int
+            Step of the time slot for energy to be delivered (see utils.time_step).
+
+        """
+
+        if time_delivery not in self.__open:
+            return
+
+        bids, asks = self.__open[time_delivery].orders()
+        if not bids or not asks:
+            return
+
+        bid_prices = np.fromiter((bid.price for bid in bids), dtype=np.float64, count=len(bids))
+        bid_quantities = np.fromiter((bid.quantity for bid in bids), dtype=np.int64, count=len(bids))
+        ask_prices = np.fromiter((ask.price for ask in asks), dtype=np.float64, count=len(asks))
+        ask_quantities = np.fromiter((ask.quantity for ask in asks), dtype=np.int64, count=len(asks))
+
+        volume, price = clearing_price(bid_prices, bid_quantities, ask_prices, ask_quantities)
+        if not volume:
+            return
+
+        # settle the allocations at the clearing price
+        buys = [Order(bid.id, bid.participant_id, quantity, price)
+                for bid, quantity in zip(bids, allocate(bid_prices, bid_quantities, volume).tolist()) if quantity]
+        sells = [Order(ask.id, ask.participant_id, quantity, price, source=ask.source, source_type=ask.source_type)
+                 for ask, quantity in zip(asks, allocate(ask_prices, ask_quantities, volume).tolist()) if quantity]
+
+        head = 0
+        for buy in buys:
+            while head < len(sells) and sells[head].quantity <= 0:
+                head += 1
+
+            for sell in sells[head:]:
+                if sell.quantity <= 0 or sell.participant_id == buy.participant_id:
+                    continue
+
+                await self.settle(buy, sell, time_delivery)
+                if buy.quantity <= 0:
+                    break
@@ -2,16 +2,16 @@
 import asyncio
 import calendar
 import datetime
-import itertools
 import os
 import signal
-import tenacity
 import time
-from cuid2 import Cuid
-from operator import itemgetter
 
 from TREX_Core.markets.Grid import Market as Grid
-from TREX_Core.utils import db_utils, source_classifier
+from TREX_Core.markets.base.OrderBook import order_books
+from TREX_Core.markets.base.Records import Order, Settlement, Transaction
+from TREX_Core.markets.base.SlotBuffer import SlotBuffer
+from TREX_Core.utils import db_utils, db_writer, source_classifier, utils
+from TREX_Core.utils.id_allocator import IdAllocator, qualify
 
 
 class Market:
@@ -23,7 +23,8 @@ class Market:
     bids and asks are organized by source type
     the addition of delivery time requires that the bids and asks to be further organized by time slot
 
-    Bids/asks can be are accepted for any time slot starting from one step into the future to infinity
+    Time slots are identified by integer steps from the start of the episode, see utils.time_step
+    Bids/asks are accepted for time slots from the current round up to close_steps into the future
     The minimum close slot is determined by 'close_steps', where a close_steps of 2 is 1 step into the future
     The the minimum close time slot is the last delivery slot that will accept bids/asks
 
@@ -37,18 +38,23 @@ class Market:
             'active_participants': 0,
             'round_metered': 0,
             'round_matched': False,
-            'round_settled': [],
+            'round_settled': set(),
             # 'round_settle_delivered': []
-            'round_settle_delivered': dict()
+            'round_settle_delivered': dict(),
+            'round_settle_confirmed': 0
         }
+        # set as soon as the last meter reading or settlement confirmation of the round arrives
+        self.__round_complete = asyncio.Event()
 
         self.__time_step_s = kwargs['time_step_size'] if 'time_step_size' in kwargs else 60
         self.__timing = {
             'mode': 'sim',
             'timezone': kwargs['timezone'],
-            'current_round': (0, self.__time_step_s),
+            # time slots are integer steps from the start of the episode (see utils.time_step)
+            'start_time': None,
+            'current_round': 0,
             'duration': self.__time_step_s,
-            'last_round': (0, 0),
+            'last_round': -1,
             'close_steps': kwargs['close_steps'] if 'close_steps' in kwargs else 2
             # close steps = 2 for 1 step-ahead market agent debugging
 
@@ -56,9 +62,16 @@ class Market:
             # bids and asks are settled 15 steps ahead of delivery time
             # settle takes 1 step after bid/ask submision
         }
+        # per slot state is kept in ring buffers indexed by step
+        # a slot is needed from when its orders are submitted, close_steps ahead of the current round,
+        # until it is cleaned two rounds after delivery
+        self.__buffer_size = self.__timing['close_steps'] + 3
 
         self.__db = dict()
         self.__db['path'] = kwargs['output_db']
+        # transactions go to the output database, or to columnar files in output_db if a file sink is selected
+        self.__db['sink'] = kwargs.get('output_sink', 'database')
+        self.__writer = db_writer.sinks[self.__db['sink']]
         # self.__output_db = kwargs['output_db']
         self.save_transactions = True
         self.market_id = market_id
@@ -71,11 +84,27 @@ class Market:
 
         self.__grid = Grid(**kwargs['grid_params'])
 
-        self.__open = {}
-        self.__settled = {}
+        # matching backend for the order book of each delivery time slot
+        # 'columnar' keeps the book in NumPy arrays, which scales better for large communities
+        self.__order_book = order_books[kwargs.get('matching', 'order_book')]
+        # continuous matching settles bids and asks against the resting book as they arrive,
+        # instead of matching the whole book once the slot closes
+        self.__continuous_matching = kwargs.get('continuous_matching', False)
+        self.__arrivals = set()
+        self.__open = SlotBuffer(self.__buffer_size)
+        self.__settled = SlotBuffer(self.__buffer_size)
+        # batched mode sends every fill of a participant for the round in one 'settled' message
+        self.__batch_settlements = kwargs.get('batch_settlements', False)
+        self.__settlement_batches = {}
+        # netting combines the fills of a buyer/seller pair for the same source and slot into a single settlement
+        self.__net_settlements = kwargs.get('net_settlements', False)
+        self.__netted = {}
+        self.__commit_ids = IdAllocator(market_id)
         self.__transactions = []
         self.__transaction_last_record_time = 0
         self.transactions_count = 0
+        # commit futures of the transactions handed to the writer
+        self.__transaction_writes = []
 
     def __time(self):
         """Return time based on time convention
@@ -93,6 +122,15 @@ class Market:
         if self.__timing['mode'] == 'sim':
             return self.__server_ts
 
+    def __interval(self, step):
+        """Returns the (start, end) UNIX timestamps of a step"""
+        return utils.step_interval(step, self.__timing['start_time'], self.__timing['duration'])
+
+    def __slot_is_open(self, step):
+        # orders are accepted up to the next slot to settle, and not for slots that have already been delivered
+        current_step = self.__timing['current_round']
+        return current_step <= step <= current_step + self.__timing['close_steps']
+
     def mode_switch(self, mode):
         """Switch timing modes between real-time mode and simulation mode
 
@@ -111,6 +149,10 @@ class Market:
         # if 'table' not in self.__db or self.__db['table'] is None:
         # table_name = self.__db.pop('table_name') + '_market'
         table_name += '_market'
+        if self.__db['sink'] != 'database':
+            self.__db['table'] = db_utils.market_table(table_name)
+            return
+
         await db_utils.create_market_table(
             db_string=db_string,
             table_name=table_name)
@@ -135,19 +177,22 @@ class Market:
         if client_data['id'] not in self.__participants:
             self.__participants[client_data['id']] = {
                 'sid': client_data['sid'],
+                'session': client_data.get('session'),
                 'online': True,
-                'meter': {}
+                'meter': SlotBuffer(self.__buffer_size)
             }
         else:
             # if previously registered participant returned, update with new session ID and toggle online status
+            # a restarted participant allocates its entry ids again, from a new id session
             self.__participants[client_data['id']].update({
                 # 'client_id': client_data['client_id'],
+                'session': client_data.get('session'),
                 'online': True
             })
         # self.__clients[client_data['sid']] = client_data['id']
         self.__status['active_participants'] = min(self.__status['active_participants'] + 1,
                                                    len(self.__participants))
-        return self.market_id, self.sid, self.__timing['timezone']
+        return self.market_id, self.sid, self.__timing['timezone'], self.__commit_ids.session
 
     async def participant_disconnected(self, participant_id):
         # if a registered participant disconnects for any reason, switch online status to off
@@ -156,9 +201,7 @@ class Market:
         })
         # self.__clients.pop(self.__participants[participant_id]['sid'], None)
         self.__status['active_participants'] -= 1
-
-    async def __classify_source(self, source):
-        return await source_classifier.classify(source)
+        self.__check_round_complete()
 
     # Initialize variables for new time step
     def __reset_status(self):
@@ -166,6 +209,8 @@ class Market:
         self.__status['round_matched'] = False
         self.__status['round_settled'].clear()
         self.__status['round_settle_delivered'].clear()
+        self.__status['round_settle_confirmed'] = 0
+        self.__round_complete.clear()
 
     async def get_market_info(self):
         market_info = {
@@ -194,11 +239,13 @@ class Market:
         #     'current_round': (self.__grid.buy_price(), self.__grid.sell_price()),
         #     'next_settle': (self.__grid.buy_price(), self.__grid.sell_price())
         # }
+        # participants convert between timestamps and steps with the start time of the episode
         start_msg = [
             start_time,
             duration,
             self.__timing['close_steps'],
-            market_info
+            market_info,
+            self.__timing['start_time']
         ]
         self.__client.publish('/'.join([self.market_id, 'start_round']), start_msg,
                               user_property=('to', '^all'))
@@ -262,29 +309,23 @@ class Market:
         # if entry is valid, then update entry with market specific info
         # convert kwh price to token price
 
-        entry = {
-            'id': entry_id,
-            'participant_id': participant_id,
-            'quantity': quantity,
-            'price': price,
-            'time_submission': self.__time(),
-
-            # 'lock': False
-        }
+        # create a new order book if the time slot doesn't exist
+        time_delivery = message[4]
+        # entry validity check step 3: the slot must still be open
+        if not self.__slot_is_open(time_delivery):
+            return
 
-        # create a new time slot container if the time slot doesn't exist
-        time_delivery = tuple(message[4])
         if time_delivery not in self.__open:
-            self.__open[time_delivery] = {
-                'bid': []
-            }
-
-        # if the time slot exists but no entry exist, create the entry container
-        if 'bid' not in self.__open[time_delivery]:
-            self.__open[time_delivery]['bid'] = []
+            self.__open[time_delivery] = self.__order_book()
 
         # add open entry
-        self.__open[time_delivery]['bid'].append(entry)
+        # entry ids are only unique for the participant's id session, so orders are kept by their qualified id
+        order_id = qualify(participant_id, self.__participants[participant_id]['session'], entry_id)
+        if self.__continuous_matching:
+            self.__match_arrival(time_delivery, self.__open[time_delivery].match_bid(
+                order_id, participant_id, quantity, price, self.__time()))
+        else:
+            self.__open[time_delivery].add_bid(order_id, participant_id, quantity, price, self.__time())
         return entry_id, participant_id, self.__participants[participant_id]['sid']
 
     async def submit_ask(self, message: dict):
@@ -355,8 +396,9 @@ class Market:
             return
 
         # entry validity check step 2: source must be classifiable
-        source_type = await self.__classify_source(source)
-        if not source_type:
+        # the source type is resolved once here and stored with the ask as an integer code
+        source_type = source_classifier.source_type_codes.get(source.lower())
+        if source_type is None:
             # raise Exception('quantity must be a positive integer')
             # return message['session_id'], {'uuid': None}
             return
@@ -364,33 +406,65 @@ class Market:
         # if entry is valid, then update entry with market specific info
         # convert kwh price to token price
 
-        entry = {
-            'id': entry_id,
-            'participant_id': participant_id,
-            'quantity': quantity,
-            'price': price,
-            'source': source,
-            'time_submission': self.__time(),
-
-            # 'lock': False
-        }
+        # create a new order book if the time slot doesn't exist
+        time_delivery = message[4]
+        # entry validity check step 3: the slot must still be open
+        if not self.__slot_is_open(time_delivery):
+            return
 
-        # create a new time slot container if the time slot doesn't exist
-        time_delivery = tuple(message[4])
         if time_delivery not in self.__open:
-            self.__open[time_delivery] = {
-                'ask': []
-            }
-
-        # if the time slot exists but no entry exist, create the entry container
-        if 'ask' not in self.__open[time_delivery]:
-            self.__open[time_delivery]['ask'] = []
+            self.__open[time_delivery] = self.__order_book()
 
         # add open entry
-        self.__open[time_delivery]['ask'].append(entry)
+        order_id = qualify(participant_id, self.__participants[participant_id]['session'], entry_id)
+        if self.__continuous_matching:
+            self.__match_arrival(time_delivery, self.__open[time_delivery].match_ask(
+                order_id, participant_id, quantity, price, source, source_type, self.__time()))
+        else:
+            self.__open[time_delivery].add_ask(order_id, participant_id, quantity, price, source, source_type,
+                                               self.__time())
         # print(entry_id, participant_id, self.__participants[participant_id]['sid'])
         return entry_id, participant_id, self.__participants[participant_id]['sid']
 
+    async def submit_orders(self, message: list):
+        """Processes every bid and ask a participant sends for a round, in one message
+
+        Each entry is validated and added exactly as if it was sent on its own (see submit_bid and submit_ask),
+        bids first, then asks, in the order they were sent.
+        Accepted entries are confirmed together, so the participant gets one confirmation for all of its orders.
+
+        Parameters
+        ----------
+        message : list
+            [bids, asks], lists of bid and ask entries in the same format as for submit_bid and submit_ask.
+            All entries must be from the same participant
+
+        Returns
+        -------
+        confirmation
+            None if no entry was accepted, else the entry ids of the accepted bids and asks,
+            the participant id and the participant session id
+        """
+        bids, asks = message
+        bid_ids = []
+        ask_ids = []
+        participant = None
+        for bid in bids:
+            confirmation = await self.submit_bid(bid)
+            if confirmation is not None:
+                bid_ids.append(confirmation[0])
+                participant = confirmation[1:]
+        for ask in asks:
+            confirmation = await self.submit_ask(ask)
+            if confirmation is not None:
+                ask_ids.append(confirmation[0])
+                participant = confirmation[1:]
+
+        if participant is None:
+            return
+        participant_id, participant_sid = participant
+        return bid_ids, ask_ids, participant_id, participant_sid
+
     async def __match(self, time_delivery):
         """Matches bids with asks for a single source type in a time slot
 
@@ -400,8 +474,8 @@ class Market:
 
         Parameters
         ----------
-        time_delivery : tuple
-            Tuple containing the start and end timestamps in UNIX timestamp format indicating the interval for energy to be delivered.
+        time_delivery : int
+            Step of the time slot for energy to be delivered (see utils.time_step).
 
         Notes
         -----
@@ -412,50 +486,52 @@ class Market:
         if time_delivery not in self.__open:
             return
 
-        if {'ask', 'bid'} > self.__open[time_delivery].keys():
-            return
-
-        # remove zero-quantity bid and ask entries
-        # sort bids by decreasing price and asks by increasing price
-        # def filter_bids_asks():
-        self.__open[time_delivery]['ask'][:] = \
-            sorted([ask for ask in self.__open[time_delivery]['ask'] if ask['quantity'] > 0],
-                   key=itemgetter('price'), reverse=False)
-        self.__open[time_delivery]['bid'][:] = \
-            sorted([bid for bid in self.__open[time_delivery]['bid'] if bid['quantity'] > 0],
-                   key=itemgetter('price'), reverse=True)
-
-        # await asyncio.get_event_loop().run_in_executor(filter_bids_asks)
-
-        bids = self.__open[time_delivery]['bid']
-        asks = self.__open[time_delivery]['ask']
+        # bids are kept in decreasing price order and asks in increasing price order by the order book,
+        # so matching stops as soon as the book no longer crosses
+        for bid, ask in self.__open[time_delivery].crossing():
+            await self.settle(bid, ask, time_delivery)
 
-        for bid, ask, in itertools.product(bids, asks):
-            if ask['price'] > bid['price']:
-                continue
+    def __match_arrival(self, time_delivery, fills):
+        """Settles the fills of a new bid or ask in continuous matching mode
 
-            if bid['participant_id'] == ask['participant_id']:
-                continue
-
-            if bid['quantity'] <= 0 or ask['quantity'] <= 0:
-                continue
+        Settlement is scheduled rather than awaited, so that the entry is acknowledged to the participant
+        before any of its settlements are sent. Arrivals are still matched in the order they were submitted.
+        """
+        task = asyncio.create_task(self.__settle_arrival(time_delivery, fills))
+        self.__arrivals.add(task)
+        task.add_done_callback(self.__arrival_done)
+
+    def __arrival_done(self, task):
+        self.__arrivals.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print('could not settle arrival', repr(task.exception()))
+
+    async def __wait_arrivals(self):
+        """Waits until the arrivals being settled are done, raising the exception of any that failed"""
+        while self.__arrivals:
+            await asyncio.gather(*self.__arrivals)
+
+    async def __settle_arrival(self, time_delivery, fills):
+        for bid, ask in fills:
             await self.settle(bid, ask, time_delivery)
+        self.__commit_netted()
+        await self.__send_settlement_batches()
 
-    async def settle(self, bid: dict, ask: dict, time_delivery: tuple):
+    async def settle(self, bid: Order, ask: Order, time_delivery: int):
         """Performs settlement for bid/ask pairs found during the matching process.
 
         If bid/ask are valid, the bid/ask quantities are adjusted, a commitment record is created, and a settlement confirmation is sent to both participants.
 
         Parameters
         ----------
-        bid: dict
+        bid: Order
             bid entry to be settled. Should be a reference to the open bid
 
-        ask: dict
+        ask: Order
             bid entry to be settled. Should be a reference to the open ask
 
-        time_delivery : tuple
-            Tuple containing the start and end timestamps in UNIX timestamp format.
+        time_delivery : int
+            Step of the delivery time slot.
 
         locking: bool
         Optinal locking mode, which locks the bid and ask until a callback is received after settlement confirmation is sent. The default value is False.
@@ -470,11 +546,11 @@ class Market:
         """
 
         # grid is not allowed to interact through market
-        if ask['source'] == 'grid':
+        if ask.source == 'grid':
             return
 
         # only proceed to settle if settlement quantity is positive
-        quantity = min(bid['quantity'], ask['quantity'])
+        quantity = min(bid.quantity, ask.quantity)
         if quantity <= 0:
             return
 
@@ -483,69 +559,167 @@ class Market:
         #     ask['lock'] = True
         #     bid['lock'] = True
 
-        commit_id = Cuid().generate(6)
-        settlement_time = self.__timing['current_round'][1]
-        settlement_price_sell = ask['price']
-        settlement_price_buy = bid['price']
-        record = {
-            'quantity': quantity,
-            'seller_id': ask['participant_id'],
-            'buyer_id': bid['participant_id'],
-            'energy_source': ask['source'],
-            'settlement_price_sell': settlement_price_sell,
-            'settlement_price_buy': settlement_price_buy,
-            'time_purchase': settlement_time
-        }
+        settlement_time = self.__interval(self.__timing['current_round'])[1]
+        settlement_price_sell = ask.price
+        settlement_price_buy = bid.price
+
+        if self.__net_settlements:
+            self.__net(bid, ask, quantity, time_delivery, settlement_time)
+        else:
+            self.__commit(time_delivery, ask.source_type,
+                          Settlement(quantity, ask.participant_id, bid.participant_id, ask.source,
+                                     settlement_price_sell, settlement_price_buy, settlement_time),
+                          bid.id, ask.id)
+        bid.quantity = max(0, bid.quantity - quantity)
+        ask.quantity = max(0, ask.quantity - quantity)
+        return quantity, settlement_price_buy, settlement_price_sell
+
+    def __commit(self, time_delivery, source_type, settlement, bid_entry, ask_entry, fills=None):
+        """Records a settlement and sends the settlement confirmation to the buyer and the seller
+
+        bid_entry and ask_entry are the settled (qualified) entry ids,
+        or lists of [entry_id, quantity] for settlements that combine several entries.
+        Participants are sent the entry ids they allocated, without their id session.
+        fills are the settlements combined by a netted settlement, which are recorded instead of it,
+        so that energy is exchanged for each of them as if they were not netted
+        """
+        commit_id = self.__commit_ids.next()
+        bid_entry = self.__local_entry(bid_entry)
+        ask_entry = self.__local_entry(ask_entry)
 
         # Record successful settlements
+        # settlements are indexed by source type, then by (buyer, seller), so that energy exchange
+        # only has to visit the pairs that actually traded
+        source_type = source_classifier.source_types[source_type]
+        pair = (settlement.buyer_id, settlement.seller_id)
         if time_delivery not in self.__settled:
             self.__settled[time_delivery] = {}
-
-        self.__settled[time_delivery][commit_id] = {
-            'time_settlement': settlement_time,
-            'source': ask['source'],
-            'record': record,
-            'ask': ask,
-            'seller_id': ask['participant_id'],
-            'bid': bid,
-            'buyer_id': bid['participant_id'],
-        }
+        if source_type not in self.__settled[time_delivery]:
+            self.__settled[time_delivery][source_type] = {}
+        if pair not in self.__settled[time_delivery][source_type]:
+            self.__settled[time_delivery][source_type][pair] = {}
+
+        if fills:
+            for idx, fill in enumerate(fills):
+                self.__settled[time_delivery][source_type][pair][(commit_id, idx)] = fill
+        else:
+            self.__settled[time_delivery][source_type][pair][commit_id] = settlement
 
         # if buyer == 'grid' or seller == 'grid':
         # if buy_price is not None and sell_price is not None:
         #     return
         buyer_message = [
             commit_id,
-            bid['id'],
-            ask['source'],
-            quantity,
+            bid_entry,
+            settlement.energy_source,
+            settlement.quantity,
             time_delivery
         ]
 
         seller_message = [
             commit_id,
-            ask['id'],
-            ask['source'],
-            quantity,
+            ask_entry,
+            settlement.energy_source,
+            settlement.quantity,
             time_delivery
         ]
-        self.__client.publish('/'.join([self.market_id, bid['participant_id'], 'settled']), buyer_message,
-                            user_property=('to', self.__participants[bid['participant_id']]['sid']))
-        self.__client.publish('/'.join([self.market_id, ask['participant_id'], 'settled']), seller_message,
-                            user_property=('to', self.__participants[ask['participant_id']]['sid']))
-        bid['quantity'] = max(0, bid['quantity'] - self.__settled[time_delivery][commit_id]['record']['quantity'])
-        ask['quantity'] = max(0, ask['quantity'] - self.__settled[time_delivery][commit_id]['record']['quantity'])
-        self.__status['round_settled'].append(commit_id)
-        return quantity, settlement_price_buy, settlement_price_sell
+        if self.__batch_settlements:
+            self.__batch_settlement(settlement.buyer_id, buyer_message)
+            self.__batch_settlement(settlement.seller_id, seller_message)
+        else:
+            self.__client.publish('/'.join([self.market_id, settlement.buyer_id, 'settled']), buyer_message,
+                                user_property=('to', self.__participants[settlement.buyer_id]['sid']))
+            self.__client.publish('/'.join([self.market_id, settlement.seller_id, 'settled']), seller_message,
+                                user_property=('to', self.__participants[settlement.seller_id]['sid']))
+        self.__status['round_settled'].add(commit_id)
+        return commit_id
+
+    @staticmethod
+    def __local_entry(entry):
+        if isinstance(entry, list):
+            return [[entry_id[2], quantity] for entry_id, quantity in entry]
+        return entry[2]
+
+    def __net(self, bid, ask, quantity, time_delivery, settlement_time):
+        # fills of the same buyer, seller and source are combined until the end of the matching pass
+        key = (time_delivery, bid.participant_id, ask.participant_id, ask.source)
+        if key not in self.__netted:
+            self.__netted[key] = {
+                'source_type': ask.source_type,
+                'prices': (bid.price, ask.price),
+                'quantity': 0,
+                'value_buy': 0,
+                'value_sell': 0,
+                'bids': {},
+                'asks': {},
+                'fills': []
+            }
+        netted = self.__netted[key]
+        netted['quantity'] += quantity
+        netted['value_buy'] += quantity * bid.price
+        netted['value_sell'] += quantity * ask.price
+        netted['bids'][bid.id] = netted['bids'].get(bid.id, 0) + quantity
+        netted['asks'][ask.id] = netted['asks'].get(ask.id, 0) + quantity
+        netted['fills'].append(Settlement(quantity, ask.participant_id, bid.participant_id, ask.source,
+                                          ask.price, bid.price, settlement_time))
+
+    def __commit_netted(self):
+        """Commits one settlement for each buyer, seller and source combined by __net, at quantity weighted prices
+
+        Only the settlement messages are netted. Energy is exchanged for each fill (see __process_settlements),
+        so that a seller generating less than settled is short by the same quantities with or without netting
+        """
+        settlement_time = self.__interval(self.__timing['current_round'])[1]
+        for (time_delivery, buyer_id, seller_id, source), netted in self.__netted.items():
+            quantity = netted['quantity']
+            fills = None
+            if len(netted['bids']) == 1 and len(netted['asks']) == 1:
+                # a single fill keeps its prices and entry ids as they are
+                bid_entry = next(iter(netted['bids']))
+                ask_entry = next(iter(netted['asks']))
+                price_buy, price_sell = netted['prices']
+            else:
+                fills = netted['fills']
+                bid_entry = [[entry_id, entry_quantity] for entry_id, entry_quantity in netted['bids'].items()]
+                ask_entry = [[entry_id, entry_quantity] for entry_id, entry_quantity in netted['asks'].items()]
+                price_buy = netted['value_buy'] / quantity
+                price_sell = netted['value_sell'] / quantity
+            settlement = Settlement(quantity, seller_id, buyer_id, source, price_sell, price_buy, settlement_time)
+            self.__commit(time_delivery, netted['source_type'], settlement, bid_entry, ask_entry, fills)
+        self.__netted.clear()
+
+    def __batch_settlement(self, participant_id, message):
+        if participant_id not in self.__settlement_batches:
+            self.__settlement_batches[participant_id] = []
+        self.__settlement_batches[participant_id].append(message)
+
+    async def __send_settlement_batches(self):
+        """Sends one 'settled' message per participant, containing the list of all of its settlements for the round
+        """
+        for participant_id, messages in self.__settlement_batches.items():
+            self.__client.publish('/'.join([self.market_id, participant_id, 'settled']), messages,
+                                  user_property=('to', self.__participants[participant_id]['sid']))
+        self.__settlement_batches.clear()
 
     # after settlement confirmation, update bid and ask quantities
     async def settlement_delivered(self, message):
         # self.__status['round_settle_delivered'].append(commit_id)
-        commit_id = message.pop(next(iter(message)))
-        if commit_id not in self.__status['round_settle_delivered']:
-            self.__status['round_settle_delivered'][commit_id] = 1
-        else:
-            self.__status['round_settle_delivered'][commit_id] += 1
+        # batched confirmations carry a list of commit ids
+        commit_ids = message.pop(next(iter(message)))
+        if not isinstance(commit_ids, list):
+            commit_ids = [commit_ids]
+
+        for commit_id in commit_ids:
+            if commit_id not in self.__status['round_settle_delivered']:
+                self.__status['round_settle_delivered'][commit_id] = 1
+            else:
+                self.__status['round_settle_delivered'][commit_id] += 1
+
+            # a settlement is confirmed once both the buyer and the seller have acknowledged it
+            if self.__status['round_settle_delivered'][commit_id] == 2 \
+                    and commit_id in self.__status['round_settled']:
+                self.__status['round_settle_confirmed'] += 1
+        self.__check_round_complete()
 
     async def meter_data(self, message):
         """Update meter data from participant
@@ -574,89 +748,110 @@ class Market:
         # TODO: add data validation later
         # print(message)
         participant_id = message[0]
-        time_delivery = tuple(message[1])
+        time_delivery = message[1]
         meter = message[2]
 
         self.__participants[participant_id]['meter'][time_delivery] = meter
         self.__status['round_metered'] += 1
+        self.__check_round_complete()
 
     async def __process_settlements(self, time_delivery, source_type):
         physical_tranactions = []
         financial_transactions = []
-        settlements = self.__settled[time_delivery]
-        for buyer in self.__participants:
-            for seller in self.__participants:
-                if buyer == seller:
-                    continue
-                # make sure the buyer and seller are online
-                if not self.__participants[buyer]['online']:
-                    continue
-                if not self.__participants[seller]['online']:
-                    continue
+        settlements = self.__settled[time_delivery].get(source_type)
+        if not settlements:
+            return physical_tranactions, financial_transactions
+
+        # visit buyer/seller pairs in the same order as the participants joined the market
+        rank = {participant_id: idx for idx, participant_id in enumerate(self.__participants)}
+        pairs = sorted(settlements, key=lambda pair: (rank[pair[0]], rank[pair[1]]))
+        for buyer, seller in pairs:
+            if buyer == seller:
+                continue
+            # make sure the buyer and seller are online
+            if not self.__participants[buyer]['online']:
+                continue
+            if not self.__participants[seller]['online']:
+                continue
 
-                # Extract settlements involving buyer and seller (that are not locked)
-                relevant_settlements = {k: v for (k, v) in settlements.items() if
-                                        # settlements[k]['lock'] is False and
-                                        settlements[k]['buyer_id'] == buyer and
-                                        settlements[k]['seller_id'] == seller}
-
-                if relevant_settlements:
-                    for commit_id in relevant_settlements.keys():
-                        energy_source = self.__settled[time_delivery][commit_id]['source']
-                        energy_type = await self.__classify_source(energy_source)
-                        if energy_type != source_type:
-                            continue
-
-                        settled_quantity = self.__settled[time_delivery][commit_id]['record']['quantity']
-                        if not settled_quantity:
-                            continue
-                        residual_generation = self.__participants[seller]['meter'][time_delivery]['generation'][
-                            energy_source]
-                        residual_consumption = \
-                            self.__participants[buyer]['meter'][time_delivery]['load']['other']['ext']
-
-                        # check to see if physical generation is less than settled quantity
-                        # extra_purchase = 0
-                        deficit_generation = max(0, settled_quantity - residual_generation)
-                        # Add on the amount that needed to be bought from the grid?
-                        # self.__participants[buyer]['meter']['consumption']['other']['ext'] += deficit_generation
-                        # if not deficit_generation:
-                        # check if settled quantity is greater than residual consumption
-                        # if settled amount is greater than residual generation, then figure out
-                        # the financial compensation.
-                        extra_purchase = max(0, settled_quantity - residual_consumption)
-                        # print(settled_quantity, energy_source, residual_generation, residual_consumption, extra_purchase, deficit_generation)
-                        pt, ft = await self.__transfer_energy(time_delivery, commit_id, extra_purchase,
-                                                              deficit_generation)
-                        physical_tranactions.extend(pt)
-                        financial_transactions.extend(ft)
+            # settlements involving buyer and seller
+            relevant_settlements = settlements[(buyer, seller)]
+            pair_financial_transactions = []
+            for commit_id in list(relevant_settlements):
+                energy_source = relevant_settlements[commit_id].energy_source
+                settled_quantity = relevant_settlements[commit_id].quantity
+                if not settled_quantity:
+                    continue
+                residual_generation = self.__participants[seller]['meter'][time_delivery]['generation'][
+                    energy_source]
+                residual_consumption = \
+                    self.__participants[buyer]['meter'][time_delivery]['load']['other']['ext']
+
+                # check to see if physical generation is less than settled quantity
+                # extra_purchase = 0
+                deficit_generation = max(0, settled_quantity - residual_generation)
+                # Add on the amount that needed to be bought from the grid?
+                # self.__participants[buyer]['meter']['consumption']['other']['ext'] += deficit_generation
+                # if not deficit_generation:
+                # check if settled quantity is greater than residual consumption
+                # if settled amount is greater than residual generation, then figure out
+                # the financial compensation.
+                extra_purchase = max(0, settled_quantity - residual_consumption)
+                # print(settled_quantity, energy_source, residual_generation, residual_consumption, extra_purchase, deficit_generation)
+                pt, ft = await self.__transfer_energy(time_delivery, source_type, relevant_settlements, commit_id,
+                                                      extra_purchase, deficit_generation)
+                physical_tranactions.extend(pt)
+                pair_financial_transactions.extend(ft)
+            if self.__net_settlements:
+                pair_financial_transactions = self.__net_transactions(pair_financial_transactions)
+            financial_transactions.extend(pair_financial_transactions)
         return physical_tranactions, financial_transactions
 
+    @staticmethod
+    def __net_transactions(transactions):
+        """Combines the transactions of the same seller, buyer and source, at quantity weighted prices"""
+        netted = {}
+        for transaction in transactions:
+            key = (transaction.seller_id, transaction.buyer_id, transaction.energy_source)
+            if key not in netted:
+                netted[key] = [transaction, 0, 0, 0]
+            netted[key][1] += transaction.quantity
+            netted[key][2] += transaction.quantity * transaction.settlement_price_sell
+            netted[key][3] += transaction.quantity * transaction.settlement_price_buy
+
+        transactions = []
+        for transaction, quantity, value_sell, value_buy in netted.values():
+            transactions.append(Transaction(quantity, transaction.seller_id, transaction.buyer_id,
+                                            transaction.energy_source, value_sell / quantity, value_buy / quantity,
+                                            transaction.time_creation, transaction.time_purchase,
+                                            transaction.time_consumption))
+        return transactions
+
     # async def __process_self_consumption(self, participant_id):
 
     async def __scrub_financial_transaction(self, transactions):
         scrubbed_transactions = {}
         for transaction in transactions:
-            if transaction['seller_id'] not in scrubbed_transactions:
-                scrubbed_transactions[transaction['seller_id']] = {
+            if transaction.seller_id not in scrubbed_transactions:
+                scrubbed_transactions[transaction.seller_id] = {
                     'buy': [],
                     'sell': []
                 }
-            if transaction['buyer_id'] not in scrubbed_transactions:
-                scrubbed_transactions[transaction['buyer_id']] = {
+            if transaction.buyer_id not in scrubbed_transactions:
+                scrubbed_transactions[transaction.buyer_id] = {
                     'buy': [],
                     'sell': []
                 }
             scrubbed_transaction = {
-                'quantity': transaction['quantity'],
-                'energy_source': transaction['energy_source'],
-                'settlement_price_sell': transaction['settlement_price_sell'],
-                'settlement_price_buy': transaction['settlement_price_buy'],
-                'time_creation': transaction['time_creation'],
-                'time_purchase': transaction['time_purchase']
+                'quantity': transaction.quantity,
+                'energy_source': transaction.energy_source,
+                'settlement_price_sell': transaction.settlement_price_sell,
+                'settlement_price_buy': transaction.settlement_price_buy,
+                'time_creation': transaction.time_creation,
+                'time_purchase': transaction.time_purchase
             }
-            scrubbed_transactions[transaction['buyer_id']]['buy'].append(scrubbed_transaction)
-            scrubbed_transactions[transaction['seller_id']]['sell'].append(scrubbed_transaction)
+            scrubbed_transactions[transaction.buyer_id]['buy'].append(scrubbed_transaction)
+            scrubbed_transactions[transaction.seller_id]['sell'].append(scrubbed_transaction)
         return scrubbed_transactions
 
     async def __process_energy_exchange(self, time_delivery):
@@ -694,6 +889,8 @@ class Market:
         # process auction deliveries
         transactions = []
         financial_transactions = []
+        # records are timestamped with the start and end of the slot
+        time_start, time_end = self.__interval(time_delivery)
         # Step 1: exchange settled
         if time_delivery in self.__settled:
             for source_type in {'dispatch', 'non_dispatch'}:
@@ -724,18 +921,8 @@ class Market:
                             source]
 
                         if quantity > 0:
-                            transaction_record = {
-                                'quantity': quantity,
-                                'seller_id': participant_id,
-                                'buyer_id': participant_id,
-                                'energy_source': source,
-                                'settlement_price_sell': 0,
-                                'settlement_price_buy': 0,
-                                'time_creation': time_delivery[0],
-                                'time_purchase': time_delivery[1],
-                                'time_consumption': time_delivery[1]
-                            }
-                            transactions.append(transaction_record.copy())
+                            transactions.append(Transaction(quantity, participant_id, participant_id, source, 0, 0,
+                                                            time_start, time_end, time_end))
                             self.__participants[participant_id]['meter'][time_delivery]['load'][load][
                                 source] -= quantity
 
@@ -751,18 +938,9 @@ class Market:
             for source in self.__participants[participant_id]['meter'][time_delivery]['generation']:
                 residual_generation = self.__participants[participant_id]['meter'][time_delivery]['generation'][source]
                 if residual_generation > 0:
-                    transaction_record = {
-                        'quantity': residual_generation,
-                        'seller_id': participant_id,
-                        'buyer_id': self.__grid.id,
-                        'energy_source': source,
-                        'settlement_price_sell': self.__grid.sell_price(),
-                        'settlement_price_buy': self.__grid.sell_price(),
-                        'time_creation': time_delivery[0],
-                        'time_purchase': time_delivery[1],
-                        'time_consumption': time_delivery[1]
-                    }
-                    transactions.append(transaction_record.copy())
+                    transactions.append(Transaction(residual_generation, participant_id, self.__grid.id, source,
+                                                    self.__grid.sell_price(), self.__grid.sell_price(),
+                                                    time_start, time_end, time_end))
                     self.__participants[participant_id]['meter'][time_delivery]['generation'][
                         source] -= residual_generation
 
@@ -778,18 +956,9 @@ class Market:
             residual_consumption = self.__participants[participant_id]['meter'][time_delivery]['load']['other'][
                 'ext']
             if residual_consumption > 0:
-                transaction_record = {
-                    'quantity': residual_consumption,
-                    'seller_id': self.__grid.id,
-                    'buyer_id': participant_id,
-                    'energy_source': 'grid',
-                    'settlement_price_sell': self.__grid.buy_price(),
-                    'settlement_price_buy': self.__grid.buy_price(),
-                    'time_creation': time_delivery[0],
-                    'time_purchase': time_delivery[1],
-                    'time_consumption': time_delivery[1]
-                }
-                transactions.append(transaction_record.copy())
+                transactions.append(Transaction(residual_consumption, self.__grid.id, participant_id, 'grid',
+                                                self.__grid.buy_price(), self.__grid.buy_price(),
+                                                time_start, time_end, time_end))
                 self.__participants[participant_id]['meter'][time_delivery]['load']['other'][
                     'ext'] -= residual_consumption
 
@@ -818,21 +987,23 @@ class Market:
             self.__transactions.extend(transactions)
             await self.record_transactions(10000)
 
-    async def __transfer_energy(self, time_delivery, commit_id, extra_purchase=0, deficit_generation=0):
-        # pt, ft = await self.__transfer_energy(time_delivery, commit_id, extra_purchase, deficit_generation)
+    async def __transfer_energy(self, time_delivery, source_type, settlements, commit_id,
+                                extra_purchase=0, deficit_generation=0):
+        # pt, ft = await self.__transfer_energy(time_delivery, source_type, settlements, commit_id, extra_purchase, deficit_generation)
         """This function makes the energy transaction records for each settlement
 
+        settlements are the settlements of one buyer/seller pair for the source type, keyed by commit id
+
         """
 
         physical_transactions = []
         financial_transactions = []
-        seller_id = self.__settled[time_delivery][commit_id]['seller_id']
-        buyer_id = self.__settled[time_delivery][commit_id]['buyer_id']
-        energy_source = self.__settled[time_delivery][commit_id]['source']
+        time_start, time_end = self.__interval(time_delivery)
+        settlement = settlements[commit_id]
+        seller_id = settlement.seller_id
+        buyer_id = settlement.buyer_id
+        energy_source = settlement.energy_source
         physical_qty = 0
-        settlement = self.__settled[time_delivery][commit_id]['record']
-        # For extra consumption by buyer greater than settled amount:
-        physical_record = settlement.copy()
 
         # extra purchase by buyer
         # buyer settled for more than consumed
@@ -845,30 +1016,20 @@ class Market:
         # extra_purchase and deficit_generation SHOULD be mutually exclusive
 
         if not extra_purchase and not deficit_generation:
-            physical_record.update({
-                'time_creation': time_delivery[0],
-                'time_consumption': time_delivery[1],
-            })
-            physical_qty = physical_record['quantity']
+            physical_record = self.__settled_transaction(settlement, settlement.quantity, time_start, time_end)
+            physical_qty = physical_record.quantity
             self.__participants[seller_id]['meter'][time_delivery]['generation'][energy_source] -= physical_qty
             self.__participants[buyer_id]['meter'][time_delivery]['load']['other']['ext'] -= physical_qty
             physical_transactions.append(physical_record)
         # settled for more than consumed
         elif extra_purchase:
-            physical_record.update({
-                'quantity': physical_record['quantity'] - extra_purchase,
-                'time_creation': time_delivery[0],
-                'time_consumption': time_delivery[1],
-            })
-            financial_record = settlement.copy()
-            financial_record.update({
-                'quantity': extra_purchase,
-                'time_creation': time_delivery[0]
-            })
+            physical_record = self.__settled_transaction(settlement, settlement.quantity - extra_purchase,
+                                                         time_start, time_end)
+            financial_record = self.__settled_transaction(settlement, extra_purchase, time_start)
             financial_transactions.append(financial_record)
 
-            if physical_record['quantity']:
-                physical_qty = physical_record['quantity']
+            if physical_record.quantity:
+                physical_qty = physical_record.quantity
                 self.__participants[seller_id]['meter'][time_delivery]['generation'][energy_source] -= physical_qty
                 self.__participants[buyer_id]['meter'][time_delivery]['load']['other'][
                     'ext'] -= physical_qty
@@ -885,7 +1046,6 @@ class Market:
             # second, financially compensate by buying energy from grid for buyer. These are financial.
 
             # battery can only compensate for non-dispatch settlements for now
-            source_type = await self.__classify_source(settlement['energy_source'])
             if source_type == 'non_dispatch':
                 residual_bess = self.__participants[seller_id]['meter'][time_delivery]['generation']['bess']
                 bess_compensation = min(deficit_generation, residual_bess)
@@ -896,17 +1056,10 @@ class Market:
                 #       physical_qty)
 
                 if bess_compensation > 0:
-                    compensation_record = {
-                        'quantity': bess_compensation,
-                        'seller_id': settlement['seller_id'],
-                        'buyer_id': settlement['buyer_id'],
-                        'energy_source': 'bess',
-                        'settlement_price_sell': settlement['settlement_price_sell'],
-                        'settlement_price_buy': settlement['settlement_price_buy'],
-                        'time_creation': time_delivery[0],
-                        'time_purchase': settlement['time_purchase'],
-                        'time_consumption': time_delivery[1]
-                    }
+                    compensation_record = Transaction(bess_compensation, settlement.seller_id, settlement.buyer_id,
+                                                      'bess', settlement.settlement_price_sell,
+                                                      settlement.settlement_price_buy, time_start,
+                                                      settlement.time_purchase, time_end)
                     self.__participants[seller_id]['meter'][time_delivery]['generation']['bess'] -= bess_compensation
                     self.__participants[buyer_id]['meter'][time_delivery]['load']['other'][
                         'ext'] -= bess_compensation
@@ -928,21 +1081,21 @@ class Market:
             #     print(self.__participants[seller_id]['meter'][time_delivery])
 
             if deficit_generation > 0:
-                financial_record = {
-                    'quantity': deficit_generation,
-                    'seller_id': seller_id,
-                    'buyer_id': buyer_id,
-                    'energy_source': 'grid',
-                    'settlement_price_sell': 0,
-                    'settlement_price_buy': -self.__grid.buy_price(),  # seller pays buyer
-                    'time_creation': time_delivery[0],
-                    'time_purchase': time_delivery[1]
-                }
+                financial_record = Transaction(deficit_generation, seller_id, buyer_id, 'grid',
+                                               0, -self.__grid.buy_price(),  # seller pays buyer
+                                               time_start, time_end)
                 financial_transactions.append(financial_record)
 
-        await self.__complete_settlement(time_delivery, commit_id)
+        await self.__complete_settlement(settlements, commit_id)
         return physical_transactions, financial_transactions
 
+    @staticmethod
+    def __settled_transaction(settlement, quantity, time_creation, time_consumption=None):
+        # transaction at the settled prices. Financial transactions have no time of consumption
+        return Transaction(quantity, settlement.seller_id, settlement.buyer_id, settlement.energy_source,
+                           settlement.settlement_price_sell, settlement.settlement_price_buy,
+                           time_creation, settlement.time_purchase, time_consumption)
+
     # async def __complete_settlement_cb(self, time_delivery, commit_id):
     #     if not commit_id:
     #         return
@@ -954,7 +1107,7 @@ class Market:
     #     del self.__settled[time_delivery][commit_id]
 
     # mark completion of successful settlements
-    async def __complete_settlement(self, time_delivery, commit_id):
+    async def __complete_settlement(self, settlements, commit_id):
         # message = {
         #     'time_delivery': time_delivery,
         #     'commit_id': commit_id,
@@ -963,23 +1116,29 @@ class Market:
         # }
         # await self.__client.emit('settlement_complete', message, namespace='/market', callback=self.__complete_settlement_cb)
         # await self.__client.emit('settlement_complete', message, namespace='/market')
-        del self.__settled[time_delivery][commit_id]
+        del settlements[commit_id]
 
-    @tenacity.retry(wait=tenacity.wait_random(1, 5))
     async def ensure_transactions_complete(self):
-        table_len = db_utils.get_table_len(self.__db['path'], self.__db['table'])
-        if table_len < self.transactions_count:
-            raise Exception
+        """Waits until all the recorded transactions have been committed
+
+        Raises the writer's exception if a batch could not be written.
+        """
+        writes = self.__transaction_writes
+        self.__transaction_writes = []
+        await asyncio.gather(*writes)
         return True
 
+    async def close_writer(self):
+        """Writes the remaining transactions, then closes the output sink of the market"""
+        await self.__writer.close()
+
     async def record_transactions(self, buf_len=0, delay=True, check_table_len=False):
         """This function records the transaction records into the ledger
 
         """
 
         if check_table_len:
-            table_len = db_utils.get_table_len(self.__db['path'], self.__db['table'])
-            if table_len < self.transactions_count:
+            if not all(write.done() for write in self.__transaction_writes):
                 return False
 
         if delay and buf_len:
@@ -992,8 +1151,11 @@ class Market:
         if transactions_len < buf_len:
             return False
 
-        transactions = self.__transactions[:transactions_len]
-        await asyncio.create_task(db_utils.dump_data(transactions, self.__db['path'], self.__db['table']))
+        # records are only converted to rows for the database
+        transactions = [transaction.to_dict() for transaction in self.__transactions[:transactions_len]]
+        # rows are written in the background, so the market step does not wait for the database
+        self.__transaction_writes.append(
+            await self.__writer.write(transactions, self.__db['path'], self.__db['table']))
 
         self.__transaction_last_record_time = datetime.datetime.now().timestamp()
         del self.__transactions[:transactions_len]
@@ -1003,70 +1165,72 @@ class Market:
     async def __clean_market(self, time_delivery):
         # clean buffer from 2 rounds before the current round
         # ensure this will not interfere with settlement callbacks
-        duration = self.__timing['duration']
-        time_clean = (time_delivery[0] - duration, time_delivery[1] - duration)
+        time_clean = time_delivery - 1
         self.__open.pop(time_clean, None)
         self.__settled.pop(time_clean, None)
         for participant in self.__participants:
-            self.__participants[participant]['meter'].pop(time_delivery, None)
+            self.__participants[participant]['meter'].pop(time_clean, None)
 
     async def __update_time(self, time):
         self.__server_ts = time['time']
         duration = time['duration']
         start_time = time['time']
-        end_time = start_time + duration
+        # the first round of the episode is step 0
+        if self.__timing['start_time'] is None:
+            self.__timing['start_time'] = start_time
+        current_round = utils.time_step(start_time, self.__timing['start_time'], duration)
         self.__timing.update({
             'timezone': self.__timing['timezone'],
             'duration': duration,
             'last_round': self.__timing['current_round'],
-            'current_round': (start_time, end_time),
-            'last_settle': (start_time + duration * (self.__timing['close_steps'] - 1),
-                            start_time + duration * self.__timing['close_steps']),
-            'next_settle': (start_time + duration * self.__timing['close_steps'],
-                            start_time + duration * (self.__timing['close_steps'] + 1))
-            # 'next_settle': (1433152800, 1433149200)
+            'current_round': current_round,
+            'last_settle': current_round + self.__timing['close_steps'] - 1,
+            'next_settle': current_round + self.__timing['close_steps']
         })
         # print(self.__timing)
 
-    # Make sure time interval provided is valid
-    async def __time_interval_is_valid(self, time_interval: tuple):
-        duration = self.__timing['duration']
-        if (time_interval[1] - time_interval[0]) % duration != 0:
-            # make sure duration is a multiple of round duration
-            return False
-        if time_interval[0] % duration != 0:
-            return False
-        if time_interval[1] % duration != 0:
-            return False
-        return True
-
     async def __match_all(self, time_delivery):
         await self.__match(time_delivery)
+        self.__commit_netted()
+        await self.__send_settlement_batches()
         self.__status['round_matched'] = True
+        self.__check_round_complete()
 
-    # should be for simulation mode only
-    @tenacity.retry(wait=tenacity.wait_fixed(0.01))
-    async def __ensure_round_complete(self):
-        # print(self.__status)
+    def __check_round_complete(self):
+        """Releases the step waiting in __ensure_round_complete once every participant has sent its meter data
+        and every settlement of the round has been confirmed by both parties
+        """
         if self.__status['round_metered'] < self.__status['active_participants']:
-            raise Exception
+            return
 
         if not self.__status['round_matched']:
-            raise Exception
+            return
 
-        keys = [k for k, v in self.__status['round_settle_delivered'].items() if v == 2]
-        if set(keys) != set(self.__status['round_settled']):
-            # if set(self.__status['round_settle_delivered']) != set(self.__status['round_settled']):
-            raise Exception
+        if self.__status['round_settle_confirmed'] < len(self.__status['round_settled']):
+            return
+
+        self.__round_complete.set()
+
+    # should be for simulation mode only
+    async def __ensure_round_complete(self):
+        # print(self.__status)
+        await self.__round_complete.wait()
+        # arrivals settled during the round add settlements that must be confirmed as well
+        while self.__arrivals:
+            await self.__wait_arrivals()
+            self.__round_complete.clear()
+            self.__check_round_complete()
+            await self.__round_complete.wait()
 
     # Finish all processes and remove all unnecessary/ remaining records in preparation for a new time step, begin processes for next step
     async def step(self, timeout=60, sim_params=None):
         # timing for simulation mode and real-time mode a slightly different due to one with an explicit end condition. RT mode sequence is not too relevant at the moment will be added later.
         # if self.__timing['mode'] == 'sim':
         await self.__update_time(sim_params)
-        if not self.__timing['current_round'][0] % 3600:
-            self.__grid.update_price(self.__timing['current_round'][0], self.__timing['timezone'])
+        if not self.__server_ts % 3600:
+            self.__grid.update_price(self.__server_ts, self.__timing['timezone'])
         await self.__start_round(duration=timeout)
+        await self.__wait_arrivals()
         await self.__match_all(self.__timing['last_settle'])
         await self.__ensure_round_complete()
         # print(self.__status)
@@ -1096,6 +1260,7 @@ class Market:
     async def reset_market(self):
         # self.__db.clear()
         self.transactions_count = 0
+        self.__timing['start_time'] = None
         self.__open.clear()
         self.__settled.clear()
         for participant in self.__participants:
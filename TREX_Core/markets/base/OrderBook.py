@@ -0,0 +1,368 @@
+import bisect
+import heapq
+from operator import attrgetter
+
+import numpy as np
+
+from TREX_Core.markets.base.Records import Order
+from TREX_Core.utils import source_classifier
+
+_price = attrgetter('price')
+_ask_priority = attrgetter('price', 'sequence')
+
+
+def _bid_key(entry):
+    return -entry.price
+
+
+class OrderBook:
+    """Price-indexed bids and asks for a single delivery time slot
+
+    Bids are kept sorted by decreasing price and asks by increasing price as they are submitted,
+    so the book never has to be re-sorted before matching.
+    Entries with equal prices keep their order of submission, which is the same priority the market had
+    when the whole book was sorted at the end of the round.
+
+    Asks are partitioned by source type (see source_classifier.source_types),
+    and the partitions are merged back by price and order of submission when the book is matched.
+
+    """
+
+    def __init__(self):
+        self.bids = []
+        self.asks = tuple([] for _ in source_classifier.source_types)
+        self.__sequence = 0
+
+    def add_bid(self, entry_id, participant_id, quantity, price, time_submission):
+        """Inserts a bid entry in O(log n) comparisons"""
+        entry = Order(entry_id, participant_id, quantity, price, time_submission)
+        bisect.insort_right(self.bids, entry, key=_bid_key)
+
+    def add_ask(self, entry_id, participant_id, quantity, price, source, source_type, time_submission):
+        """Inserts an ask entry into the partition of its source type in O(log n) comparisons"""
+        entry = Order(entry_id, participant_id, quantity, price, time_submission, source, source_type,
+                      self.__sequence)
+        self.__sequence += 1
+        bisect.insort_right(self.asks[source_type], entry, key=_price)
+
+    def crossing(self):
+        """Yields bid/ask pairs that can be settled, in order of price priority
+
+        Highest bids are matched with lowest asks using two pointers.
+        The ask pointer only moves past asks that have been completely filled,
+        and matching stops at the first bid that does not cross the lowest remaining ask.
+        Quantities are read lazily, so the caller is expected to settle each pair (and update the entry quantities)
+        before asking for the next one.
+
+        Pairs where the buyer and the seller are the same participant are skipped.
+
+        """
+        asks = list(heapq.merge(*self.asks, key=_ask_priority))
+        asks_len = len(asks)
+        head = 0
+        for bid in self.bids:
+            if bid.quantity <= 0:
+                continue
+
+            while head < asks_len and asks[head].quantity <= 0:
+                head += 1
+
+            if head == asks_len or asks[head].price > bid.price:
+                # the book no longer crosses
+                return
+
+            for idx in range(head, asks_len):
+                ask = asks[idx]
+                if ask.price > bid.price:
+                    break
+
+                if ask.quantity <= 0:
+                    continue
+
+                if bid.participant_id == ask.participant_id:
+                    continue
+
+                yield bid, ask
+                if bid.quantity <= 0:
+                    break
+
+    def orders(self):
+        """returns the open bids and asks with positive quantities, each in order of price priority"""
+        bids = [bid for bid in self.bids if bid.quantity > 0]
+        asks = [ask for ask in heapq.merge(*self.asks, key=_ask_priority) if ask.quantity > 0]
+        return bids, asks
+
+    def match_bid(self, entry_id, participant_id, quantity, price, time_submission):
+        """Matches an incoming bid against the resting asks, for continuous matching
+
+        Yields bid/ask pairs with the lowest asks first, in the same way as crossing().
+        Once the caller is done settling, filled asks are removed from the book,
+        and the rest of the bid, if any, is added to it.
+
+        """
+        bid = Order(entry_id, participant_id, quantity, price, time_submission)
+        # only the asks at or below the bid price can be matched
+        ends = [bisect.bisect_right(partition, price, key=_price) for partition in self.asks]
+        try:
+            for ask in heapq.merge(*(partition[:end] for partition, end in zip(self.asks, ends)),
+                                   key=_ask_priority):
+                if ask.quantity <= 0 or ask.participant_id == participant_id:
+                    continue
+
+                yield bid, ask
+                if bid.quantity <= 0:
+                    break
+        finally:
+            for partition, end in zip(self.asks, ends):
+                partition[:end] = [ask for ask in partition[:end] if ask.quantity > 0]
+            if bid.quantity > 0:
+                bisect.insort_right(self.bids, bid, key=_bid_key)
+
+    def match_ask(self, entry_id, participant_id, quantity, price, source, source_type, time_submission):
+        """Matches an incoming ask against the resting bids, for continuous matching
+
+        See match_bid
+        """
+        ask = Order(entry_id, participant_id, quantity, price, time_submission, source, source_type,
+                    self.__sequence)
+        self.__sequence += 1
+        # only the bids at or above the ask price can be matched
+        end = bisect.bisect_right(self.bids, -price, key=_bid_key)
+        try:
+            for bid in self.bids[:end]:
+                if bid.quantity <= 0 or bid.participant_id == participant_id:
+                    continue
+
+                yield bid, ask
+                if ask.quantity <= 0:
+                    break
+        finally:
+            self.bids[:end] = [bid for bid in self.bids[:end] if bid.quantity > 0]
+            if ask.quantity > 0:
+                bisect.insort_right(self.asks[source_type], ask, key=_price)
+
+
+class _Columns:
+    """Growable column storage for one side of a ColumnarOrderBook"""
+
+    def __init__(self, capacity=64):
+        self.size = 0
+        self.ids = []
+        self.price = np.empty(capacity, dtype=np.float64)
+        self.quantity = np.empty(capacity, dtype=np.int64)
+        self.participant = np.empty(capacity, dtype=np.int32)
+        self.source = np.empty(capacity, dtype=np.int8)
+        self.source_type = np.empty(capacity, dtype=np.int8)
+
+    def append(self, entry_id, participant, quantity, price, source=-1, source_type=-1):
+        if self.size == len(self.price):
+            self.__grow()
+        row = self.size
+        self.ids.append(entry_id)
+        self.price[row] = price
+        self.quantity[row] = quantity
+        self.participant[row] = participant
+        self.source[row] = source
+        self.source_type[row] = source_type
+        self.size += 1
+
+    def __grow(self):
+        for column in ('price', 'quantity', 'participant', 'source', 'source_type'):
+            array = getattr(self, column)
+            setattr(self, column, np.concatenate((array, np.empty_like(array))))
+
+    def sorted_rows(self, descending=False):
+        """returns the rows with positive quantity, sorted by price. Ties keep their order of submission"""
+        price = self.price[:self.size]
+        rows = np.argsort(-price if descending else price, kind='stable')
+        return rows[self.quantity[rows] > 0]
+
+    def rows(self):
+        """returns the columns as Python lists, which are much cheaper to index one row at a time"""
+        size = self.size
+        return _Rows(self.ids,
+                     self.participant[:size].tolist(),
+                     self.quantity[:size].tolist(),
+                     self.price[:size].tolist(),
+                     self.source[:size].tolist(),
+                     self.source_type[:size].tolist())
+
+
+class _Rows:
+    __slots__ = ('ids', 'participant', 'quantity', 'price', 'source', 'source_type')
+
+    def __init__(self, ids, participant, quantity, price, source, source_type):
+        self.ids = ids
+        self.participant = participant
+        self.quantity = quantity
+        self.price = price
+        self.source = source
+        self.source_type = source_type
+
+
+class ColumnarOrderBook:
+    """Order book for a single delivery time slot that keeps bids and asks as NumPy columns
+
+    Each side is stored as price, quantity, participant index, source and source type code arrays
+    instead of per-order dicts.
+    Matching follows the same price priority as OrderBook (highest bids with lowest asks, ties in order of submission),
+    but the sequence of fills is computed in one pass with cumulative quantities and searchsorted:
+    every fill is the overlap between one bid and one ask on the cumulative quantity axis,
+    up to the first pair that no longer crosses.
+
+    If that pass runs into a self-trade, which the vectorized merge cannot skip,
+    the rest of the book is matched with the same two pointer loop as OrderBook.
+
+    Quantities are stored as integers (Wh).
+
+    """
+
+    def __init__(self):
+        self.bids = _Columns()
+        self.asks = _Columns()
+        self.participants = []
+        self.__participant_index = {}
+
+    def __participant(self, participant_id):
+        if participant_id not in self.__participant_index:
+            self.__participant_index[participant_id] = len(self.participants)
+            self.participants.append(participant_id)
+        return self.__participant_index[participant_id]
+
+    def add_bid(self, entry_id, participant_id, quantity, price, time_submission):
+        self.bids.append(entry_id, self.__participant(participant_id), quantity, price)
+
+    def add_ask(self, entry_id, participant_id, quantity, price, source, source_type, time_submission):
+        self.asks.append(entry_id, self.__participant(participant_id), quantity, price,
+                         source_classifier.source_codes[source.lower()], source_type)
+
+    def orders(self):
+        """returns the open bids and asks with positive quantities, each in order of price priority
+
+        The orders are copies, so settling them does not change the quantities in the columns.
+        """
+        bids = self.bids.rows()
+        asks = self.asks.rows()
+        return ([self.__order(bids, row) for row in self.bids.sorted_rows(descending=True).tolist()],
+                [self.__order(asks, row) for row in self.asks.sorted_rows().tolist()])
+
+    def match_bid(self, entry_id, participant_id, quantity, price, time_submission):
+        """Adds a bid and matches it against the resting asks, for continuous matching
+
+        The resting book never crosses (apart from self-trades), so crossing() only yields pairs with the new bid.
+        Each call sorts the book, which makes OrderBook the better backend for continuous matching.
+        """
+        self.add_bid(entry_id, participant_id, quantity, price, time_submission)
+        yield from self.crossing()
+
+    def match_ask(self, entry_id, participant_id, quantity, price, source, source_type, time_submission):
+        """Adds an ask and matches it against the resting bids, for continuous matching, see match_bid"""
+        self.add_ask(entry_id, participant_id, quantity, price, source, source_type, time_submission)
+        yield from self.crossing()
+
+    def crossing(self):
+        """Yields bid/ask pairs that can be settled, in order of price priority
+
+        Pairs are yielded as Order records, like OrderBook entries, carrying the remaining quantities of the two orders.
+        The caller is expected to settle each pair and reduce the order quantities accordingly
+        before asking for the next one. The settled quantities are then written back to the columns.
+
+        """
+        if not self.bids.size or not self.asks.size:
+            return
+
+        bid_rows = self.bids.sorted_rows(descending=True)
+        ask_rows = self.asks.sorted_rows()
+        if not bid_rows.size or not ask_rows.size:
+            return
+
+        fill_bids, fill_asks, interrupted = self.__merge(bid_rows, ask_rows)
+        bids = self.bids.rows()
+        asks = self.asks.rows()
+        try:
+            for bid_row, ask_row in zip(fill_bids.tolist(), fill_asks.tolist()):
+                yield from self.__fill(bids, asks, bid_row, ask_row)
+
+            if interrupted:
+                yield from self.__crossing_rows(bids, asks, bid_rows.tolist(), ask_rows.tolist())
+        finally:
+            self.bids.quantity[:self.bids.size] = bids.quantity
+            self.asks.quantity[:self.asks.size] = asks.quantity
+
+    def __merge(self, bid_rows, ask_rows):
+        """Computes the fills of the crossing part of the book in one vectorized pass
+
+        Returns the bid rows and ask rows of every fill, in order,
+        and whether the pass stopped at a self-trade rather than at the end of the crossing book.
+        """
+        bids = self.bids
+        asks = self.asks
+        cum_bid = np.cumsum(bids.quantity[bid_rows])
+        cum_ask = np.cumsum(asks.quantity[ask_rows])
+
+        # every boundary between two consecutive fills is the end of a bid or an ask on the cumulative axis
+        total = min(cum_bid[-1], cum_ask[-1])
+        edges = np.union1d(cum_bid, cum_ask)
+        edges = edges[edges <= total]
+        starts = np.concatenate(([0], edges[:-1]))
+        bid_pos = np.searchsorted(cum_bid, starts, side='right')
+        ask_pos = np.searchsorted(cum_ask, starts, side='right')
+        fill_bids = bid_rows[bid_pos]
+        fill_asks = ask_rows[ask_pos]
+
+        crossing = asks.price[fill_asks] <= bids.price[fill_bids]
+        regular = crossing & (asks.participant[fill_asks] != bids.participant[fill_bids])
+        if regular.all():
+            return fill_bids, fill_asks, False
+
+        stop = int(np.argmin(regular))
+        return fill_bids[:stop], fill_asks[:stop], bool(crossing[stop])
+
+    def __crossing_rows(self, bids, asks, bid_rows, ask_rows):
+        """Two pointer matching over sorted rows, see OrderBook.crossing"""
+        asks_len = len(ask_rows)
+        head = 0
+        for bid_row in bid_rows:
+            if bids.quantity[bid_row] <= 0:
+                continue
+
+            while head < asks_len and asks.quantity[ask_rows[head]] <= 0:
+                head += 1
+
+            if head == asks_len or asks.price[ask_rows[head]] > bids.price[bid_row]:
+                return
+
+            for idx in range(head, asks_len):
+                ask_row = ask_rows[idx]
+                if asks.price[ask_row] > bids.price[bid_row]:
+                    break
+
+                if asks.quantity[ask_row] <= 0:
+                    continue
+
+                if bids.participant[bid_row] == asks.participant[ask_row]:
+                    continue
+
+                yield from self.__fill(bids, asks, bid_row, ask_row)
+                if bids.quantity[bid_row] <= 0:
+                    break
+
+    def __order(self, rows, row):
+        if rows.source[row] < 0:
+            return Order(rows.ids[row], self.participants[rows.participant[row]], rows.quantity[row], rows.price[row])
+        return Order(rows.ids[row], self.participants[rows.participant[row]], rows.quantity[row], rows.price[row],
+                     source=source_classifier.sources[rows.source[row]], source_type=rows.source_type[row])
+
+    def __fill(self, bids, asks, bid_row, ask_row):
+        bid = self.__order(bids, bid_row)
+        ask = self.__order(asks, ask_row)
+        yield bid, ask
+        bids.quantity[bid_row] = bid.quantity
+        asks.quantity[ask_row] = ask.quantity
+
+
+# matching backends that can be selected with 'matching' in the market configuration
+order_books = {
+    'order_book': OrderBook,
+    'columnar': ColumnarOrderBook
+}
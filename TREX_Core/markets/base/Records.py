@@ -0,0 +1,83 @@
+def _repr(record):
+    """Shows the fields of a record, so records print as readably as the dicts they replaced"""
+    fields = ', '.join(f'{name}={getattr(record, name)!r}' for name in record.__slots__)
+    return f'{type(record).__name__}({fields})'
+
+
+class Order:
+    """An open bid or ask in an order book
+
+    Asks also carry their source and source type code (see source_classifier.source_types).
+    'sequence' is the order of submission within the book, used to break price ties.
+
+    """
+    __slots__ = ('id', 'participant_id', 'quantity', 'price', 'source', 'source_type', 'time_submission',
+                 'sequence')
+    __repr__ = _repr
+
+    def __init__(self, entry_id, participant_id, quantity, price, time_submission=None,
+                 source=None, source_type=None, sequence=0):
+        self.id = entry_id
+        self.participant_id = participant_id
+        self.quantity = quantity
+        self.price = price
+        self.source = source
+        self.source_type = source_type
+        self.time_submission = time_submission
+        self.sequence = sequence
+
+
+class Settlement:
+    """A bid/ask pair settled by the market, waiting for energy exchange"""
+    __slots__ = ('quantity', 'seller_id', 'buyer_id', 'energy_source', 'settlement_price_sell',
+                 'settlement_price_buy', 'time_purchase')
+    __repr__ = _repr
+
+    def __init__(self, quantity, seller_id, buyer_id, energy_source, settlement_price_sell, settlement_price_buy,
+                 time_purchase):
+        self.quantity = quantity
+        self.seller_id = seller_id
+        self.buyer_id = buyer_id
+        self.energy_source = energy_source
+        self.settlement_price_sell = settlement_price_sell
+        self.settlement_price_buy = settlement_price_buy
+        self.time_purchase = time_purchase
+
+
+class Transaction:
+    """A physical or financial energy transaction, as recorded in the market table
+
+    Financial transactions do not have a time of consumption.
+
+    """
+    __slots__ = ('quantity', 'seller_id', 'buyer_id', 'energy_source', 'settlement_price_sell',
+                 'settlement_price_buy', 'time_creation', 'time_purchase', 'time_consumption')
+    __repr__ = _repr
+
+    def __init__(self, quantity, seller_id, buyer_id, energy_source, settlement_price_sell, settlement_price_buy,
+                 time_creation, time_purchase, time_consumption=None):
+        self.quantity = quantity
+        self.seller_id = seller_id
+        self.buyer_id = buyer_id
+        self.energy_source = energy_source
+        self.settlement_price_sell = settlement_price_sell
+        self.settlement_price_buy = settlement_price_buy
+        self.time_creation = time_creation
+        self.time_purchase = time_purchase
+        self.time_consumption = time_consumption
+
+    def to_dict(self):
+        """returns the transaction as a row for the market table"""
+        row = {
+            'quantity': self.quantity,
+            'seller_id': self.seller_id,
+            'buyer_id': self.buyer_id,
+            'energy_source': self.energy_source,
+            'settlement_price_sell': self.settlement_price_sell,
+            'settlement_price_buy': self.settlement_price_buy,
+            'time_creation': self.time_creation,
+            'time_purchase': self.time_purchase
+        }
+        if self.time_consumption is not None:
+            row['time_consumption'] = self.time_consumption
+        return row
@@ -0,0 +1,54 @@
+class SlotBuffer:
+    """Fixed size ring buffer of per time slot market state, indexed by integer step
+
+    Steps are the integer time slot indices used throughout TREX (see utils.time_step).
+    Step n is stored at position n % size, so the buffer holds at most the last 'size' steps:
+    storing a step replaces whatever was left from the step 'size' steps before it,
+    and memory stays constant however long the episode is.
+    The market sizes the buffer so that every step it still needs fits at once.
+
+    Lookups, stores and removals are O(1), with the same interface as a dict keyed by step.
+
+    """
+    __slots__ = ('size', '__steps', '__values')
+
+    def __init__(self, size):
+        self.size = size
+        self.__steps = [None] * size
+        self.__values = [None] * size
+
+    def __contains__(self, step):
+        return self.__steps[step % self.size] == step
+
+    def __getitem__(self, step):
+        position = step % self.size
+        if self.__steps[position] != step:
+            raise KeyError(step)
+        return self.__values[position]
+
+    def __setitem__(self, step, value):
+        position = step % self.size
+        self.__steps[position] = step
+        self.__values[position] = value
+
+    def __len__(self):
+        return self.size - self.__steps.count(None)
+
+    def get(self, step, default=None):
+        position = step % self.size
+        if self.__steps[position] != step:
+            return default
+        return self.__values[position]
+
+    def pop(self, step, default=None):
+        position = step % self.size
+        if self.__steps[position] != step:
+            return default
+        value = self.__values[position]
+        self.__steps[position] = None
+        self.__values[position] = None
+        return value
+
+    def clear(self):
+        self.__steps = [None] * self.size
+        self.__values = [None] * self.size
@@ -46,6 +46,7 @@ class Client:
         client.subscribe("/".join([market_id, 'join_market']), qos=0)
         client.subscribe("/".join([market_id, 'bid']), qos=0)
         client.subscribe("/".join([market_id, 'ask']), qos=0)
+        client.subscribe("/".join([market_id, 'orders']), qos=0)
         client.subscribe("/".join([market_id, 'settlement_delivered']), qos=0)
         client.subscribe("/".join([market_id, 'meter']), qos=0)
 
@@ -88,6 +89,8 @@ class Client:
                 await self.on_bid(payload)
             case 'ask':
                 await self.on_ask(payload)
+            case 'orders':
+                await self.on_orders(payload)
             case 'settlement_delivered':
                 await self.on_settlement_delivered(payload)
             case 'meter':
@@ -123,6 +126,16 @@ class Client:
         except TypeError:
             return
 
+    async def on_orders(self, orders):
+        # every bid and ask of a participant for the round, confirmed with one ack
+        orders = json.loads(orders)
+        confirmation = await self.market.submit_orders(orders)
+        if confirmation is None:
+            return
+        bid_ids, ask_ids, participant_id, participant_sid = confirmation
+        self.client.publish('/'.join([self.market.market_id, participant_id, 'orders_ack']), [bid_ids, ask_ids],
+                            user_property=('to', participant_sid))
+
     async def on_settlement_delivered(self, message):
         message = json.loads(message)
         await self.market.settlement_delivered(message)
@@ -135,13 +148,14 @@ class Client:
     async def on_participant_connected(self, message):
         # print(type(client_data))
         client_data = json.loads(message)
-        market_id, market_sid, timezone = await self.market.participant_connected(client_data)
+        market_id, market_sid, timezone, market_session = await self.market.participant_connected(client_data)
         # async def participant_connected(self, client_data):
 
         self.client.publish('/'.join([self.market.market_id, client_data['id'], 'market_info']),
                             {'id': market_id,
                              'sid': market_sid,
-                             'timezone': timezone, },
+                             'timezone': timezone,
+                             'session': market_session},
                             user_property=('to', client_data['sid']))
 
     async def on_is_market_online(self):
@@ -154,8 +168,8 @@ class Client:
         self.client.publish('/'.join([self.market.market_id, 'simulation', 'end_round']), '')
 
     async def on_start_episode(self, message):
-        # message = json.loads(message)
-        table_name = str(message) + '_' + self.market.market_id
+        message = json.loads(message)
+        table_name = str(message['episode']) + '_' + self.market.market_id
         await self.market.open_db(table_name)
 
     async def on_end_episode(self, message):
@@ -171,6 +185,7 @@ class Client:
         # await self.market.end_sim_generation()
         await self.market.record_transactions(delay=False)
         await self.market.ensure_transactions_complete()
+        await self.market.close_writer()
         await asyncio.sleep(5)
         await self.client.disconnect()
         # print('attempting to end')
@@ -1,15 +1,17 @@
-import ast
 import asyncio
 import importlib
 # import json
 
 import databases
+import numpy as np
 import tenacity
 import os
 import signal
+from sqlalchemy.exc import NoSuchTableError
 from TREX_Core.participants import ledger
-from TREX_Core.utils import db_utils, utils
-from cuid2 import Cuid
+from TREX_Core.utils import db_utils, profile_store, utils
+from TREX_Core.utils.profile_cache import ProfileCache
+from TREX_Core.utils.id_allocator import IdAllocator
 
 
 class Participant:
@@ -22,6 +24,8 @@ class Participant:
         self.run = True
         self.market_id = market_id
         self.market_connected = False
+        # id session of the market, to qualify the commit ids it sends
+        self.market_session = None
         self.participant_id = str(participant_id)
         self.sid = kwargs.get('sid', market_id)
         self.__client = sio_client
@@ -29,12 +33,16 @@ class Participant:
 
 
         self.__profile = {
-            'db_path': profile_db_path
+            'db_path': profile_db_path,
+            'store_location': kwargs.get('profile_store'),
+            'cache_params': kwargs.get('profile_cache', {})
         }
         self.output_db_path = output_db_path
+        self.output_sink = kwargs.get('output_sink', 'database')
         # print(self.output_db_path)
         # Initialize market variables
         self.__ledger = ledger.Ledger(self.participant_id)
+        self.__entry_ids = IdAllocator(self.participant_id)
         self.__extra_transactions = {}
         self.__market_info = {}
         self.__meter = {}
@@ -117,12 +125,33 @@ class Participant:
         self.__profile['db_table'] = db_utils.get_table(db_path, profile_name)
         if 'db_table' in self.__profile or self.__profile['db_table'] is not None:
             await self.__profile['db'].connect()
+            # reads outside of the preloaded episode go through the block cache instead of one query per step
+            self.__profile['cache'] = ProfileCache(self.__profile['db'], self.__profile['db_table'],
+                                                   **self.__profile['cache_params'])
+        # profiles are read from the shared store if the runner built one for the study
+        store_location = self.__profile['store_location']
+        if store_location and profile_store.load_index(store_location) is not None:
+            self.__profile['store'] = profile_store.ProfileStore(store_location)
 
     async def __get_profile_stats(self):
         """reads and returns pre-calculated profile statistics for calculating Z scores, if available.
+
+        Statistics are built by utils.profile_stats (or utils.profile_ingest).
+        They do not change during a simulation, so they are fetched once and cached.
         """
+        if 'stats' not in self.__profile:
+            self.__profile['stats'] = await self.__fetch_profile_stats()
+        if self.__profile['stats'] is None:
+            return None
+        return dict(self.__profile['stats'])
+
+    async def __fetch_profile_stats(self):
         db = self.__profile['db']
-        table = db_utils.get_table(self.__profile['db_path'], "_statistics")
+        # reflected once per process, see db_utils.get_table
+        try:
+            table = db_utils.get_table(self.__profile['db_path'], "_statistics")
+        except NoSuchTableError:
+            return None
         query = table.select().where(table.c.name == self.__profile['name'])
         # async with db.transaction():
         row = await db.fetch_one(query)
@@ -130,6 +159,88 @@ class Participant:
             return dict(row)
         return None
 
+    async def preload_profile(self, start_time, duration, steps):
+        """Loads generation and consumption for a whole episode, from the profile store if possible,
+        else from the database with one query
+
+        Once loaded, profile reads for steps in the window are array lookups instead of database queries.
+        Readings from the profile store are read from the shared memory map,
+        and the whole window is scaled in one pass (see utils.process_profiles).
+        Steps outside of the window, or of another episode start time, are still read from the database.
+
+        Args:
+            start_time (int): UNIX timestamp of the start of the episode
+            duration (int): duration of a step in seconds
+            steps (int): number of steps to load, starting from step 0
+        """
+        self.__profile.pop('preload', None)
+        readings = None
+        if 'store' in self.__profile:
+            readings = self.__profile['store'].window(self.__profile['name'], start_time, duration, steps)
+        if readings is None:
+            readings = await self.__fetch_readings(start_time, duration, steps)
+        if readings is None:
+            return False
+
+        generation, consumption = utils.process_profiles({'generation': readings[:, 0], 'consumption': readings[:, 1]},
+                                                         gen_scale=self.__profile_params['generation_scale'],
+                                                         load_scale=self.__profile_params['load_scale'])
+        self.__profile['preload'] = {
+            'start_time': start_time,
+            'duration': duration,
+            'generation': generation,
+            'consumption': consumption
+        }
+        return True
+
+    async def __fetch_readings(self, start_time, duration, steps):
+        """Reads generation and consumption for steps 0 to steps - 1 from the database with one query
+
+        Returns:
+            (steps, 2) array of unscaled readings, NaN for missing rows
+        """
+        if self.__profile.get('db_table') is None:
+            return None
+
+        db = self.__profile['db']
+        table = self.__profile['db_table']
+        # profile rows are timestamped at the end of the slot
+        first, last = start_time + duration, start_time + duration * steps
+        query = table.select().where(table.c.time.between(first, last))
+        async with db.transaction():
+            rows = await db.fetch_all(query)
+
+        readings = np.full((steps, 2), np.nan)
+        for row in rows:
+            elapsed = row['time'] - start_time
+            if elapsed % duration:
+                continue
+            readings[elapsed // duration - 1] = utils.profile_readings(row)
+        return readings
+
+    def __preloaded_profile(self, step):
+        """Returns the preloaded generation and consumption of a step, or None if it was not preloaded"""
+        preload = self.__profile.get('preload')
+        if preload is None:
+            return None
+        if preload['start_time'] != self.__timing.get('start_time') or preload['duration'] != self.__timing.get('duration'):
+            return None
+        if not 0 <= step < len(preload['generation']):
+            return None
+        # plain ints, as readings end up in JSON messages
+        return int(preload['generation'][step]), int(preload['consumption'][step])
+
+    def __scale_readings(self, readings):
+        """Scales and rounds readings the same way as utils.process_profile. Missing readings are 0, 0
+
+        Returns plain ints, as readings end up in JSON messages
+        """
+        if readings is None:
+            return 0, 0
+        generation, consumption = readings
+        return (int(round(self.__profile_params['generation_scale'] * generation, 0)),
+                int(round(self.__profile_params['load_scale'] * consumption, 0)))
+
     async def open_profile_db(self):
         await self.open_db(self.__profile['db_path'])
         # await self.get_profile_stats(self.__profile['db_path'])
@@ -145,7 +256,8 @@ class Participant:
             'type': ('participant', 'Residential'),
             'id': self.participant_id,
             'sid': self.sid,
-            'market_id': self.market_id
+            'market_id': self.market_id,
+            'session': self.__entry_ids.session
         }
         # await self.__client.emit('join_market', client_data, callback=self.register_success)
         self.__client.publish('/'.join([self.market_id, 'join_market']), client_data,
@@ -164,7 +276,8 @@ class Participant:
     #     self.busy = False
 
     async def update_extra_transactions(self, message):
-        time_delivery = tuple(message.pop('time_delivery'))
+        time_delivery = message.pop('time_delivery')
+        time_start, time_end = self.__interval(time_delivery)
         # TODO: recreate the simplified extra transactions here
 
         grid_transactions = message['grid']
@@ -177,9 +290,9 @@ class Participant:
                 'energy_source': transaction[2],
                 'settlement_price_sell': transaction[1],
                 'settlement_price_buy': transaction[1],
-                'time_creation': time_delivery[0],
-                'time_purchase': time_delivery[1],
-                'time_consumption': time_delivery[1]
+                'time_creation': time_start,
+                'time_purchase': time_end,
+                'time_consumption': time_end
             }
             grid_transactions['sell'][idx] = transaction_record.copy()
 
@@ -192,9 +305,9 @@ class Participant:
                 'energy_source': 'grid',
                 'settlement_price_sell': transaction[1],
                 'settlement_price_buy': transaction[1],
-                'time_creation': time_delivery[0],
-                'time_purchase': time_delivery[1],
-                'time_consumption': time_delivery[1]
+                'time_creation': time_start,
+                'time_purchase': time_end,
+                'time_consumption': time_end
             }
             grid_transactions['buy'][idx] = transaction_record.copy()
 
@@ -210,6 +323,14 @@ class Participant:
             time_delivery ([type], optional): [description]. Defaults to None.
         """
 
+        bid_entry = self.__bid_entry(time_delivery, **kwargs)
+        # print('bidding', self.trader.is_learner, self.__timing, bid_entry)
+        # await self.__client.emit('bid', bid_entry)
+        self.__client.publish('/'.join([self.market_id, 'bid']), bid_entry,
+                              user_property=('to', self.market_sid))
+
+    def __bid_entry(self, time_delivery=None, **kwargs):
+        """Makes a bid entry for the market, and holds it in the ledger until the market confirms it"""
         # quantity is energy in Wh
         # price is $/kWh
         if time_delivery is None:
@@ -221,7 +342,7 @@ class Participant:
         #     'price': kwargs['price'],  # $/kWh
         #     'time_delivery': time_delivery
         # }
-        entry_id = Cuid().generate(6)
+        entry_id = self.__entry_ids.next()
         bid_entry = [entry_id,
                      self.participant_id,
                      kwargs['quantity'],  # Wh
@@ -233,10 +354,7 @@ class Participant:
             'quantity': kwargs['quantity'],
             'time_delivery': time_delivery,
         }
-        # print('bidding', self.trader.is_learner, self.__timing, bid_entry)
-        # await self.__client.emit('bid', bid_entry)
-        self.__client.publish('/'.join([self.market_id, 'bid']), bid_entry,
-                              user_property=('to', self.market_sid))
+        return bid_entry
 
     # @tenacity.retry(wait=tenacity.wait_random(0, 3))
     async def ask(self, time_delivery=None, **kwargs):
@@ -245,6 +363,12 @@ class Participant:
         Args:
             time_delivery ([type], optional): [description]. Defaults to None.
         """
+        ask_entry = self.__ask_entry(time_delivery, **kwargs)
+        self.__client.publish('/'.join([self.market_id, 'ask']), ask_entry,
+                              user_property=('to', self.market_sid))
+
+    def __ask_entry(self, time_delivery=None, **kwargs):
+        """Makes an ask entry for the market, and holds it in the ledger until the market confirms it"""
         # quantity is energy in Wh
         # price is $/kWh
         if time_delivery is None:
@@ -257,7 +381,7 @@ class Participant:
         #     'source': kwargs['source'],
         #     'time_delivery': time_delivery
         # }
-        entry_id = Cuid().generate(6)
+        entry_id = self.__entry_ids.next()
         ask_entry = [
             entry_id,
             self.participant_id,
@@ -272,7 +396,20 @@ class Participant:
             'quantity': kwargs['quantity'],
             'time_delivery': time_delivery
         }
-        self.__client.publish('/'.join([self.market_id, 'ask']), ask_entry,
+        return ask_entry
+
+    async def orders(self, bids=(), asks=()):
+        """Submits bids and asks together, in one message to the market
+
+        Args:
+            bids: keyword arguments of bid() for each bid
+            asks: keyword arguments of ask() for each ask
+        """
+        message = [[self.__bid_entry(**bid) for bid in bids],
+                   [self.__ask_entry(**ask) for ask in asks]]
+        if not message[0] and not message[1]:
+            return
+        self.__client.publish('/'.join([self.market_id, 'orders']), message,
                               user_property=('to', self.market_sid))
 
     async def ask_success(self, message):
@@ -281,33 +418,52 @@ class Participant:
     async def bid_success(self, message):
         await self.__ledger.bid_success(message)
 
+    async def orders_success(self, message):
+        bid_ids, ask_ids = message
+        for entry_id in bid_ids:
+            await self.__ledger.bid_success(entry_id)
+        for entry_id in ask_ids:
+            await self.__ledger.ask_success(entry_id)
+
     async def settle_success(self, message):
         # print(message)
-        commit_id = await self.__ledger.settle_success(message)
+        # a batched message is a list of settlements, which are confirmed together with a list of commit ids
+        market = (self.market_id, self.market_session)
+        if message and isinstance(message[0], list):
+            commit_id = [await self.__ledger.settle_success(settlement, market) for settlement in message]
+        else:
+            commit_id = await self.__ledger.settle_success(message, market)
         # if commit_id == message['commit_id']:
         self.__client.publish('/'.join([self.market_id, 'settlement_delivered']),
                               {self.participant_id: commit_id},
                               user_property=('to', self.market_sid))
         # return message['commit_id']
 
+    def __interval(self, step):
+        """Returns the (start, end) UNIX timestamps of a step"""
+        return utils.step_interval(step, self.__timing['start_time'], self.__timing['duration'])
+
     async def __update_time(self, message):
         # print(message)
         # synchronizes time with market
         start_time = message[0]
         duration = message[1]
         close_steps = message[2]
-        end_time = start_time + duration
+        # time slots are integer steps from the start of the episode (see utils.time_step)
+        episode_start_time = message[4]
+        current_round = utils.time_step(start_time, episode_start_time, duration)
         # last_round = self.__timing['current_round'].copy()
 
         self.__timing.update({
             'timezone': self.timezone,
             # 'timezone': message['timezone'],
+            'start_time': episode_start_time,
             'duration': duration,
-            'last_round': (start_time - duration, start_time),
-            'current_round': (start_time, end_time),
-            'last_settle': (start_time + duration * (close_steps - 1), start_time + duration * close_steps),
-            'next_settle': (start_time + duration * close_steps, start_time + duration * (close_steps + 1)),
-            'stale_round': (start_time - duration * 10, start_time - duration * 9)
+            'last_round': current_round - 1,
+            'current_round': current_round,
+            'last_settle': current_round + close_steps - 1,
+            'next_settle': current_round + close_steps,
+            'stale_round': current_round - 10
         })
 
         # 'last_round': self.__timing['last_round'],
@@ -400,42 +556,32 @@ class Participant:
 
 
     async def __read_profile(self, time_interval):
-        """Fetches energy profile for one timestamp from database
+        """Fetches energy profile for one timestamp, from the preloaded episode if available, else from the profile cache
 
         Args:
-            time_interval ([type]): [description]
+            time_interval (int): step of the time slot
 
         Returns:
             [type]: [description]
         """
-        db = self.__profile['db']
-        table = self.__profile['db_table']
-        # query = table.select().where(table.c.tstamp == time_interval[1])
-        query = table.select().where(table.c.time == time_interval[1])
-        async with db.transaction():
-            row = await db.fetch_one(query)
-        return utils.process_profile(row=row,
-                                     gen_scale=self.__profile_params['generation_scale'],
-                                     load_scale=self.__profile_params['load_scale'])
+        preloaded = self.__preloaded_profile(time_interval)
+        if preloaded is not None:
+            return preloaded
+        return await self.__read_sensors(time_interval)
 
     async def __read_sensors(self, time_interval):
-        """Fetches energy profile for one timestamp from database
+        """Fetches energy profile for one timestamp from the profile cache, which reads the database in blocks
 
         Args:
-            time_interval ([type]): [description]
+            time_interval (int): step of the time slot
 
         Returns:
             [type]: [description]
         """
-        db = self.__profile['db']
-        table = self.__profile['db_table']
         # query = table.select().where(table.c.tstamp == time_interval[1])
-        query = table.select().where(table.c.time == time_interval[1])
-        async with db.transaction():
-            row = await db.fetch_one(query)
-        return utils.process_profile(row=row,
-                                     gen_scale=self.__profile_params['generation_scale'],
-                                     load_scale=self.__profile_params['load_scale'])
+        # profile rows are timestamped at the end of the slot
+        readings = await self.__profile['cache'].get(self.__interval(time_interval)[1])
+        return self.__scale_readings(readings)
 
     # def __process_profile(self, row):
     #     """Processes raw readings fetches from database into generation and consumption in integer Wh.
@@ -621,28 +767,33 @@ class Participant:
         #     }
         # }
 
+        # time intervals are steps. Agents outside of the process send them as JSON keys, which are strings
         # Battery charging or discharging action
         if 'bess' in actions and hasattr(self, 'storage'):
             for time_interval in actions['bess']:
-                await self.storage.schedule_energy(actions['bess'][time_interval], ast.literal_eval(time_interval))
+                await self.storage.schedule_energy(actions['bess'][time_interval], int(time_interval))
+        # bids and asks are sent to the market together, in one orders message
+        bids = []
+        asks = []
         # Bid for energy
         if 'bids' in actions:
             for time_interval in actions['bids']:
                 quantity = actions['bids'][time_interval]['quantity']
                 price = round(actions['bids'][time_interval]['price'], 4)
-                await self.bid(quantity=quantity,
-                               price=price,
-                               time_delivery=ast.literal_eval(time_interval))
+                bids.append({'quantity': quantity,
+                             'price': price,
+                             'time_delivery': int(time_interval)})
         # Ask to sell energy
         if 'asks' in actions:
             for source in actions['asks']:
                 for time_interval in actions['asks'][source]:
                     quantity = actions['asks'][source][time_interval]['quantity']
                     price = round(actions['asks'][source][time_interval]['price'], 4)
-                    await self.ask(quantity=quantity,
-                                   price=price,
-                                   source=source,
-                                   time_delivery=ast.literal_eval(time_interval))
+                    asks.append({'quantity': quantity,
+                                 'price': price,
+                                 'source': source,
+                                 'time_delivery': int(time_interval)})
+        await self.orders(bids, asks)
 
     def reset(self):
         self.__ledger.reset()
@@ -51,6 +51,7 @@ class Client:
         client.subscribe("/".join([market_id, participant_id, 'market_info']), qos=0)
         client.subscribe("/".join([market_id, participant_id, 'ask_ack']), qos=0)
         client.subscribe("/".join([market_id, participant_id, 'bid_ack']), qos=0)
+        client.subscribe("/".join([market_id, participant_id, 'orders_ack']), qos=0)
         client.subscribe("/".join([market_id, participant_id, 'settled']), qos=0)
         client.subscribe("/".join([market_id, participant_id, 'extra_transaction']), qos=0)
         # client.subscribe("/".join([market_id, 'simulation', '+']), qos=0)
@@ -128,6 +129,8 @@ if __name__ == '__main__':
     parser.add_argument('--port', default=1883, help='')
     parser.add_argument('--profile_db_path', default=None, help='')
     parser.add_argument('--output_db_path', default=None, help='')
+    parser.add_argument('--output_sink', default='database', help='')
+    parser.add_argument('--profile_store', default=None, help='')
     # parser.add_argument('--trader', default=None, help='')
     # parser.add_argument('--storage', default=None, help='')
     # parser.add_argument('--generation_scale', default=1, help='')
@@ -143,6 +146,8 @@ if __name__ == '__main__':
                     market_id=args.market_id,
                     profile_db_path=args.profile_db_path,
                     output_db_path=args.output_db_path,
+                    output_sink=args.output_sink,
+                    profile_store=args.profile_store,
                     # trader_params=args.trader,
                     # storage_params=args.storage,
                     # generation_scale=float(args.generation_scale),
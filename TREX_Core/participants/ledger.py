@@ -1,3 +1,6 @@
+from TREX_Core.utils.id_allocator import qualify
+
+
 class Ledger:
     """Ledger helps participants keep track of accepted bids/asks, and successsful settlements.
 
@@ -43,11 +46,16 @@ class Ledger:
             self.asks[time_delivery] = {}
         self.asks[time_delivery][entry_id] = entry
 
-    async def settle_success(self, confirmation):
+    async def settle_success(self, confirmation, market=(None, None)):
         """Track successful settlement
 
         Args:
             confirmation ([type]): [description]
+            market (tuple): id and id session of the market that sent the confirmation,
+                settlements are recorded by their qualified commit id
+
+        Returns:
+            the commit id, as sent by the market
         """
         # print(confirmation, self.bids, self.asks)
         # todo: add validity checks, and feedback messages for invalid settlements
@@ -57,29 +65,36 @@ class Ledger:
         entry_id = confirmation[1]
         source = confirmation[2]
         quantity = confirmation[3]
-        time_delivery = tuple(confirmation[4])
+        time_delivery = confirmation[4]
 
         if time_delivery not in self.settled:
             self.settled[time_delivery] = {'bids': {}, 'asks': {}}
         # if 'buyer_id' in confirmation and confirmation['buyer_id'] == self.__participant_id:
             # make sure settled bid exists in local record as well
-        entry_list = []
-        if time_delivery in self.bids and entry_id in self.bids[time_delivery]:
-            entry_list = ['bids', self.bids]
-        elif time_delivery in self.asks and entry_id in self.asks[time_delivery]:
-            entry_list = ['asks', self.asks]
-        else:
-            print(confirmation)
-
-        self.settled[time_delivery][entry_list[0]][commit_id] = {
+        # netted settlements combine several entries, listed as [entry_id, quantity]
+        entries = entry_id if isinstance(entry_id, list) else [[entry_id, quantity]]
+        value = 0
+        for entry_id, entry_quantity in entries:
+            entry_list = []
+            if time_delivery in self.bids and entry_id in self.bids[time_delivery]:
+                entry_list = ['bids', self.bids]
+            elif time_delivery in self.asks and entry_id in self.asks[time_delivery]:
+                entry_list = ['asks', self.asks]
+            else:
+                print(confirmation)
+
+            price = entry_list[1][time_delivery][entry_id]['price']
+            value += price * entry_quantity
+            # update local bid entry
+            entry_list[1][time_delivery][entry_id]['quantity'] -= entry_quantity
+            if entry_list[1][time_delivery][entry_id]['quantity'] <= 0:
+                entry_list[1][time_delivery].pop(entry_id)
+
+        self.settled[time_delivery][entry_list[0]][qualify(*market, commit_id)] = {
             'source': source,
-            'price': entry_list[1][time_delivery][entry_id]['price'],
+            'price': price if len(entries) == 1 else value / quantity,
             'quantity': quantity
         }
-        # update local bid entry
-        entry_list[1][time_delivery][entry_id]['quantity'] -= quantity
-        if entry_list[1][time_delivery][entry_id]['quantity'] <= 0:
-            entry_list[1][time_delivery].pop(entry_id)
 
         # elif 'seller_id' in confirmation and confirmation['seller_id'] == self.__participant_id:
         #     print(confirmation)
@@ -100,7 +115,7 @@ class Ledger:
         """Summarizes ledger data for a certain time interval
 
         Args:
-            time_interval (tuple): This time interval is not arbitrary and must be one of the market rounds that occurred in the past
+            time_interval (int): This time interval is not arbitrary and must be the step of one of the market rounds that occurred in the past
 
         Returns:
             [type]: [description]
@@ -135,7 +150,7 @@ class Ledger:
         
 
         Args:
-            time_interval (tuple): This time interval is not arbitrary and must be one of the market rounds that occurred in the past
+            time_interval (int): This time interval is not arbitrary and must be the step of one of the market rounds that occurred in the past
 
         Returns:
             [type]: [description]
@@ -3,6 +3,8 @@ import json
 import asyncio
 import numpy as np
 
+from TREX_Core.utils import db_writer
+
 class NSDefault:
     def __init__(self, participant):
         # super().__init__(namespace='')
@@ -22,6 +24,8 @@ class NSDefault:
                 await self.on_ask_success(payload)
             case 'bid_ack':
                 await self.on_bid_success(payload)
+            case 'orders_ack':
+                await self.on_orders_success(payload)
             case 'settled':
                 # print('settled?')
                 await self.on_settled(payload)
@@ -55,6 +59,7 @@ class NSDefault:
         client_data = json.loads(payload)
         if client_data['id'] == self.participant.market_id:
             self.participant.market_sid = client_data['sid']
+            self.participant.market_session = client_data.get('session')
             self.participant.timezone = client_data['timezone']
             self.participant.market_connected = True
             # self.participant.busy = False
@@ -65,13 +70,18 @@ class NSDefault:
         await self.participant.start_round(payload)
 
     async def on_ask_success(self, payload):
-        # message = json.loads(message)
+        payload = json.loads(payload)
         await self.participant.ask_success(payload)
 
     async def on_bid_success(self, payload):
-        # message = json.loads(message)
+        payload = json.loads(payload)
         await self.participant.bid_success(payload)
 
+    async def on_orders_success(self, payload):
+        # [bid entry ids, ask entry ids]
+        payload = json.loads(payload)
+        await self.participant.orders_success(payload)
+
     async def on_settled(self, payload):
         payload = json.loads(payload)
         await self.participant.settle_success(payload)
@@ -88,7 +98,7 @@ class NSDefault:
         Args:
             message ([type]): [description]
         """
-        
+        payload = json.loads(payload)
         self.participant.reset()
         if hasattr(self.participant, 'storage'):
             self.participant.storage.reset(soc_pct=0)
@@ -98,8 +108,9 @@ class NSDefault:
             # print(message)
             output_db_str = self.participant.output_db_path
             market_id = self.participant.market_id
-            table_name = f'{payload}_{market_id}_metrics'
-            self.participant.trader.metrics.update_db_info(output_db_str, table_name)
+            table_name = f"{payload['episode']}_{market_id}_metrics"
+            self.participant.trader.metrics.update_db_info(output_db_str, table_name, self.participant.output_sink)
+        await self.participant.preload_profile(payload['start_time'], payload['duration'], payload['steps'])
 
     async def on_end_episode(self, payload):
         # print("eog msg", message)
@@ -112,6 +123,7 @@ class NSDefault:
         if hasattr(self.participant.trader, 'metrics') and self.participant.trader.track_metrics:
             # await asyncio.sleep(np.random.uniform(3, 30))
             await self.participant.trader.metrics.save()
+            await self.participant.trader.metrics.ensure_metrics_complete()
             self.participant.trader.metrics.reset()
 
         # # TODO: save model
@@ -135,6 +147,8 @@ class NSDefault:
         if hasattr(self.participant.trader, 'metrics') and self.participant.trader.track_metrics:
             # await asyncio.sleep(np.random.uniform(3, 30))
             await self.participant.trader.metrics.save()
+            await self.participant.trader.metrics.ensure_metrics_complete()
+        await db_writer.sinks[self.participant.output_sink].close()
         await self.participant.kill()
 
     async def on_get_actions_return(self, payload):
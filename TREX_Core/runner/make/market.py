@@ -17,6 +17,9 @@ def cli(configs):
     market_configs = configs['market']
     market_configs['timezone'] = configs['study']['timezone']
     market_configs['output_db'] = configs['study']['output_database']
+    market_configs['output_sink'] = configs['study'].get('output_sink', 'database')
+    if market_configs['output_sink'] != 'database':
+        market_configs['output_db'] = configs['study']['output_file_location']
 
     # TODO: temporarily add method to manually define profile step size until auto detection works
     if 'time_step_size' in configs['study']:
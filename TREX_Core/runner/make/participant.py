@@ -32,7 +32,14 @@ def cli(configs, participant_id):
     args.append('--id=' + participant_id)
     args.append('--market_id=' + configs['market']['id'])
     args.append('--profile_db_path=' + configs['study']['profiles_db_location'])
-    args.append('--output_db_path=' + configs['study']['output_database'])
+    if configs['study'].get('profile_store'):
+        args.append('--profile_store=' + configs['study']['profile_store_location'])
+    output_sink = configs['study'].get('output_sink', 'database')
+    if output_sink != 'database':
+        args.append('--output_db_path=' + configs['study']['output_file_location'])
+        args.append('--output_sink=' + output_sink)
+    else:
+        args.append('--output_db_path=' + configs['study']['output_database'])
     # args.append('--trader=' + json.dumps(participant_configs['trader']))
 
     # if 'storage' in participant_configs:
@@ -6,11 +6,11 @@ import commentjson
 import numpy as np
 import sqlalchemy
 from packaging import version
-from sqlalchemy import create_engine, MetaData, Column, insert, select
+from sqlalchemy import MetaData, Column, insert, select
 from sqlalchemy.orm import Session
-from sqlalchemy_utils import database_exists, create_database, drop_database
+from sqlalchemy_utils import database_exists, create_database
 
-from TREX_Core.utils import utils, db_utils
+from TREX_Core.utils import utils, db_utils, profile_store
 
 
 def get_config(config_name: str, original=False, **kwargs):
@@ -60,6 +60,14 @@ def get_config(config_name: str, original=False, **kwargs):
     if 'output_database' not in config['study'] or not config['study']['output_database']:
         config['study']['output_database'] = db_string
 
+    # file sinks write transactions and metrics under output_file_location instead of the output database
+    if config['study'].get('output_sink', 'database') != 'database' and not config['study'].get('output_file_location'):
+        config['study']['output_file_location'] = os.path.join(root_dir, 'output', study_name)
+
+    # the profile store is built once per study, then memory-mapped by every participant
+    if config['study'].get('profile_store') and not config['study'].get('profile_store_location'):
+        config['study']['profile_store_location'] = os.path.join(root_dir, 'profile_store', study_name)
+
 
 
 
@@ -134,7 +142,7 @@ class Runner:
         # if not os.path.exists(sim_path):
         #     os.mkdir(sim_path)
         db_string = config['study']['output_database']
-        engine = create_engine(db_string)
+        engine = db_utils.get_engine(db_string)
         if not sqlalchemy.inspect(engine).has_table('metadata'):
             self.__create_metadata_table(db_string)
 
@@ -164,7 +172,7 @@ class Runner:
 
     def __create_sim_db(self, db_string, config):
         if not database_exists(db_string):
-            engine = create_engine(db_string)
+            engine = db_utils.get_engine(db_string)
             db_utils.create_db(db_string=db_string, engine=engine)
             self.__create_configs_table(db_string)
 
@@ -178,7 +186,7 @@ class Runner:
             # configs_table.insert({'id': 0, 'data': config})
 
     def __create_table(self, db_string, table):
-        engine = create_engine(db_string)
+        engine = db_utils.get_engine(db_string)
         if not database_exists(engine.url):
             create_database(engine.url)
         table.create(engine, checkfirst=True)
@@ -279,16 +287,16 @@ class Runner:
         start_time = utils.timestr_to_timestamp(start_datetime, timezone)
 
         # rudimentary check for profile time intervals
-        energy_profile_names = set()
-        for participant in config['participants']:
-            if 'use_synthetic_profile' in config['participants'][participant]['trader']:
-                energy_profile_names.add(config['participants'][participant]['trader']['use_synthetic_profile'])
-            else:
-                energy_profile_names.add(participant)
-        # energy_profile_names = set(energy_profile_names)
-        random_check = utils.secure_random.sample(list(energy_profile_names), min(len(energy_profile_names), 5))
-        interval_checks = list()
-        engine = create_engine(config['study']['profiles_db_location'])
+        energy_profile_names = self.__profile_names(config)
+        engine = db_utils.get_engine(config['study']['profiles_db_location'])
+        # profiles loaded with utils.profile_ingest had their time step size validated over the whole series
+        ingested = self.__ingested_time_step_sizes(config['study']['profiles_db_location'], energy_profile_names)
+        if ingested.keys() == energy_profile_names:
+            random_check = []
+            interval_checks = list(ingested.values())
+        else:
+            random_check = utils.secure_random.sample(list(energy_profile_names), min(len(energy_profile_names), 5))
+            interval_checks = list()
         with Session(engine) as session:
             for profile_name in random_check:
                 table = db_utils.get_table(config['study']['profiles_db_location'], profile_name, engine)
@@ -323,6 +331,43 @@ class Runner:
 
         return config
 
+    def __profile_names(self, config):
+        energy_profile_names = set()
+        for participant in config['participants']:
+            if 'use_synthetic_profile' in config['participants'][participant]['trader']:
+                energy_profile_names.add(config['participants'][participant]['trader']['use_synthetic_profile'])
+            else:
+                energy_profile_names.add(participant)
+        return energy_profile_names
+
+    def __ingested_time_step_sizes(self, db_string, profile_names):
+        """Returns the time step size recorded in the _statistics table, by profile name"""
+        engine = db_utils.get_engine(db_string)
+        if not sqlalchemy.inspect(engine).has_table('_statistics'):
+            return {}
+        table = db_utils.get_table(db_string, '_statistics', engine)
+        if 'time_step_size' not in table.c:
+            return {}
+        stm = select(table.c.name, table.c.time_step_size).where(table.c.name.in_(profile_names))
+        with Session(engine) as session:
+            return {name: time_step_size for name, time_step_size in session.execute(stm).all()
+                    if time_step_size is not None}
+
+    def build_profile_store(self, config):
+        """Builds the memory-mapped profile store shared by the participants, if the study uses one
+
+        The store covers every round of an episode, plus the slots that can be traded ahead of the last one.
+        """
+        if not config['study'].get('profile_store'):
+            return False
+        steps = config['study']['episode_steps'] + 1 + config['market'].get('close_steps', 2)
+        return profile_store.build(config['study']['profiles_db_location'],
+                                   self.__profile_names(config),
+                                   config['study']['profile_store_location'],
+                                   config['study']['start_time'],
+                                   config['study']['time_step_size'],
+                                   steps)
+
     def make_launch_list(self, config=None, skip: tuple = ()):
         from importlib import import_module
         import TREX_Core.runner.make.sim_controller as sim_controller
@@ -394,8 +439,8 @@ class Runner:
             return
 
         db_string = self.config['study']['output_database']
-        if self.purge_db and database_exists(db_string):
-            drop_database(db_string)
+        if self.purge_db:
+            db_utils.drop_db(db_string)
         # config_file = 'configs/' + self.config_file_name + '.json'
         # configs = _load_json_file(config_file)
         self.__create_sim_db(db_string, self.config_original)
@@ -413,6 +458,8 @@ class Runner:
 
         for sim_param in simulations_list:
             config = self.modify_config(**sim_param)
+            # every simulation type of a study has the same profiles and window, so this only builds once
+            self.build_profile_store(config)
             launch_list.extend(self.make_launch_list(config, **kwargs))
             # seq += 1
 
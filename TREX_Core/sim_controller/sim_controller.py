@@ -424,7 +424,15 @@ class Controller:
             # if hasattr(self, 'hyperparameters_idx'):
             #     message["market_id"] += "-hps" + str(self.hyperparameters_idx)
             # await self.__client.emit('start_generation', message)
-            self.__client.publish('/'.join([self.market_id, 'simulation', 'start_episode']), self.__episode,
+            # the episode window lets participants preload their profiles for the whole episode
+            # steps covers every round of the episode, plus the slots that can be traded ahead of the last one
+            message = {
+                'episode': self.__episode,
+                'start_time': self.__time,
+                'duration': self.__time_step_s,
+                'steps': self.__end_step + 1 + self.__config['market'].get('close_steps', 2)
+            }
+            self.__client.publish('/'.join([self.market_id, 'simulation', 'start_episode']), message,
                                   user_property=('to', '^all'))
             self.status['episode_ended'] = False
 
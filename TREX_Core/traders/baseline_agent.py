@@ -1,5 +1,6 @@
 import asyncio
 # import tenacity
+from TREX_Core.utils import utils
 from TREX_Core.utils.metrics import Metrics
 
 
@@ -51,16 +52,18 @@ class Trader:
             # if were lacking energy, get as much as possible out of battery
             if residual_load > 0:
                 effective_discharge = -min(residual_load, abs(max_discharge))
-                actions['bess'] = {str(next_settle): effective_discharge}
+                actions['bess'] = {next_settle: effective_discharge}
 
             # if we have too much generation, charge the battery as much as possible
             elif residual_gen > 0:
                 effective_charge = min(residual_gen, max_charge)
-                actions['bess'] = {str(next_settle): effective_charge}
+                actions['bess'] = {next_settle: effective_charge}
 
         if self.track_metrics:
+            timing = self.__participant['timing']
+            round_end = utils.step_interval(timing['current_round'], timing['start_time'], timing['duration'])[1]
             await asyncio.gather(
-                self.metrics.track('timestamp', self.__participant['timing']['current_round'][1]),
+                self.metrics.track('timestamp', round_end),
                 self.metrics.track('actions_dict', actions),
                 self.metrics.track('next_settle_load', load),
                 self.metrics.track('next_settle_generation', generation))
@@ -41,7 +41,9 @@ class Trader:
         last_settle = self.__participant['timing']['last_settle']
         next_settle = self.__participant['timing']['next_settle']
         timezone = self.__participant['timing']['timezone']
-        next_settle_end = utils.timestamp_to_local(next_settle[1], timezone)
+        timing = self.__participant['timing']
+        next_settle_end = utils.timestamp_to_local(
+            utils.step_interval(next_settle, timing['start_time'], timing['duration'])[1], timezone)
         charge_hours_allowed = (8, 9, 10, 11, 12, 13, 14, 15, 16)
 
         generation, load = await self.__participant['read_profile'](next_settle)
@@ -68,28 +70,28 @@ class Trader:
                     ls_residual_load = self.action_scenario_history[last_settle]['residual_load']
                     ls_max_charge = self.action_scenario_history[last_settle]['max_charge']
                     actions['bess'] = {
-                        str(last_settle): min(ls_max_charge, max(0, ls_bids - ls_residual_load))
+                        last_settle: min(ls_max_charge, max(0, ls_bids - ls_residual_load))
                     }
                 elif self.action_scenario_history[last_settle]['scenario'] == 2:
                     ls_asks = last_settle_info['asks']['quantity']
                     ls_residual_load = self.action_scenario_history[last_settle]['residual_load']
                     ls_max_discharge = self.action_scenario_history[last_settle]['max_discharge']
                     actions['bess'] = {
-                        str(last_settle): -min(abs(ls_max_discharge), (ls_residual_load + ls_asks))
+                        last_settle: -min(abs(ls_max_discharge), (ls_residual_load + ls_asks))
                     }
                 elif self.action_scenario_history[last_settle]['scenario'] == 3:
                     ls_bids = last_settle_info['bids']['quantity']
                     ls_residual_gen = self.action_scenario_history[last_settle]['residual_gen']
                     ls_max_charge = self.action_scenario_history[last_settle]['max_charge']
                     actions['bess'] = {
-                        str(last_settle): min(ls_max_charge, ls_bids + ls_residual_gen)
+                        last_settle: min(ls_max_charge, ls_bids + ls_residual_gen)
                     }
                 elif self.action_scenario_history[last_settle]['scenario'] == 4:
                     ls_asks = last_settle_info['asks']['quantity']
                     ls_residual_gen = self.action_scenario_history[last_settle]['residual_gen']
                     ls_max_discharge = self.action_scenario_history[last_settle]['max_discharge']
                     actions['bess'] = {
-                        str(last_settle): -min(abs(ls_max_discharge), max(0, ls_asks - ls_residual_gen))
+                        last_settle: -min(abs(ls_max_discharge), max(0, ls_asks - ls_residual_gen))
                     }
                 # clean up history buffer
                 stale_round = self.__participant['timing']['stale_round']
@@ -101,7 +103,7 @@ class Trader:
             if 'storage' in self.__participant:
                 if next_settle_end.hour in charge_hours_allowed:
                     actions['bids'] = {
-                        str(next_settle): {
+                        next_settle: {
                             'quantity': residual_load + max_charge,
                             'price': self.bid_price
                         }
@@ -116,7 +118,7 @@ class Trader:
                 else:
                     actions['asks'] = {
                         'bess': {
-                            str(next_settle): {
+                            next_settle: {
                                 'quantity': max(0, max_discharge - residual_load),
                                 'price': self.ask_price
                             }
@@ -132,7 +134,7 @@ class Trader:
             else:
                 # if were lacking energy, try to get difference from market
                 actions['bids'] = {
-                    str(next_settle): {
+                    next_settle: {
                         'quantity': residual_load,
                         'price': self.bid_price
                     }
@@ -143,7 +145,7 @@ class Trader:
             if 'storage' in self.__participant:
                 if next_settle_end.hour in charge_hours_allowed:
                     actions['bids'] = {
-                        str(next_settle): {
+                        next_settle: {
                             'quantity': max(0, max_charge - residual_gen),
                             'price': self.bid_price
                         }
@@ -158,13 +160,13 @@ class Trader:
                 else:
                     actions['asks'] = {
                         'solar': {
-                            str(next_settle): {
+                            next_settle: {
                                 'quantity': residual_gen,
                                 'price': self.ask_price
                             }
                         },
                         'bess': {
-                            str(next_settle): {
+                            next_settle: {
                                 'quantity': max_discharge,
                                 'price': self.ask_price
                             }
@@ -181,7 +183,7 @@ class Trader:
                 # if were lacking energy, try to get difference from market
                 actions['asks'] = {
                     'solar': {
-                        str(next_settle): {
+                        next_settle: {
                             'quantity': residual_gen,
                             'price': self.ask_price
                         }
@@ -189,8 +191,10 @@ class Trader:
                 }
 
         if self.track_metrics:
+            timing = self.__participant['timing']
+            round_end = utils.step_interval(timing['current_round'], timing['start_time'], timing['duration'])[1]
             await asyncio.gather(
-                self.metrics.track('timestamp', self.__participant['timing']['current_round'][1]),
+                self.metrics.track('timestamp', round_end),
                 self.metrics.track('actions_dict', actions),
                 self.metrics.track('next_settle_load', load),
                 self.metrics.track('next_settle_generation', generation))
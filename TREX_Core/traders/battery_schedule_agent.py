@@ -19,7 +19,9 @@ class Trader:
 
         next_settle = self.__participant['timing']['next_settle']
         timezone = self.__participant['timing']['timezone']
-        next_settle_end = utils.timestamp_to_local(next_settle[1], timezone)
+        timing = self.__participant['timing']
+        next_settle_end = utils.timestamp_to_local(
+            utils.step_interval(next_settle, timing['start_time'], timing['duration'])[1], timezone)
 
         # amount of energy that the agent has to play with.
         generation, load = await self.__participant['read_profile'](next_settle)
@@ -38,12 +40,12 @@ class Trader:
             effective_discharge = -min(residual_load, abs(max_discharge))
             if next_settle_end.hour not in (8, 9, 10, 11, 12, 13, 14, 15, 16):
                 # only allow discharge from 5PM to 7AM
-                actions['bess'] = {str(next_settle): effective_discharge}
+                actions['bess'] = {next_settle: effective_discharge}
 
         # if we have too much generation, charge the battery as much as possible
         elif residual_gen > 0:
             effective_charge = min(residual_gen, max_charge)
-            actions['bess'] = {str(next_settle): effective_charge}
+            actions['bess'] = {next_settle: effective_charge}
         return actions
 
     async def step(self):
@@ -2,13 +2,50 @@
 
 import sqlalchemy
 from sqlalchemy import create_engine, MetaData, Column, func
-from sqlalchemy_utils import database_exists, create_database
+from sqlalchemy_utils import database_exists, create_database, drop_database
 from sqlalchemy.orm import sessionmaker
 import databases
+from sqlalchemy.dialects.postgresql import asyncpg
+
+# engines and reflected tables are kept for the lifetime of the process
+# so that setting up an episode doesn't reconnect and re-reflect the schema every time
+_engines = {}
+_tables = {}
+# dialect whose bind processors prepare values for COPY, see bulk_insert
+_copy_dialect = asyncpg.dialect()
+
+def get_engine(db_string):
+    """Returns the engine for db_string, creating it on first use"""
+    if db_string not in _engines:
+        _engines[db_string] = create_engine(db_string)
+    return _engines[db_string]
+
+def invalidate_table(db_string, table_name=None):
+    """Forgets reflected tables of db_string, so they are reflected again on the next get_table
+
+    If table_name is None, all the tables of db_string are forgotten.
+    Must be called when a table is dropped or altered outside of db_utils.
+    """
+    for key in [key for key in _tables if key[0] == db_string and table_name in (None, key[1])]:
+        del _tables[key]
+
+def dispose(db_string):
+    """Closes the pooled connections of db_string and forgets its engine and tables
+
+    Must be called before the database is dropped or its file is removed.
+    """
+    invalidate_table(db_string)
+    if db_string in _engines:
+        _engines.pop(db_string).dispose()
+
+def drop_db(db_string):
+    dispose(db_string)
+    if database_exists(db_string):
+        drop_database(db_string)
 
 def create_db(db_string, engine=None):
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
     if not database_exists(engine.url):
         create_database(engine.url)
     return database_exists(engine.url)
@@ -19,13 +56,42 @@ async def dump_data(data, db_string, table):
     # query = table.insert()
     async with databases.Database(db_string) as db:
         async with db.transaction():
-            query = table.insert()
-            await db.execute_many(query, data)
+            await bulk_insert(db, table, data)
     # await db.disconnect()
 
+async def bulk_insert(db, table, data):
+    """Inserts a list of rows (dicts) over an open connection
+
+    Connections made with asyncpg (PostgreSQL) stream the rows with COPY,
+    which is much faster than inserting them one statement at a time.
+    COPY skips SQLAlchemy, so values go through the bind processors of their column types first
+    (JSON columns are serialized, for example).
+    Other drivers fall back to execute_many.
+    """
+    async with db.connection() as connection:
+        raw_connection = connection.raw_connection
+        if not hasattr(raw_connection, 'copy_records_to_table'):
+            await connection.execute_many(table.insert(), data)
+            return
+
+        keys = set().union(*data)
+        columns = [column for column in table.columns if column.name in keys]
+        processors = [column.type.dialect_impl(_copy_dialect).bind_processor(_copy_dialect) for column in columns]
+        records = [tuple(row.get(column.name) if processor is None else processor(row.get(column.name))
+                         for column, processor in zip(columns, processors))
+                   for row in data]
+        await raw_connection.copy_records_to_table(table.name,
+                                                   records=records,
+                                                   columns=[column.name for column in columns],
+                                                   schema_name=table.schema)
+
 def get_table(db_string, table_name, engine=None):
+    key = (db_string, table_name)
+    if key in _tables:
+        return _tables[key]
+
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
 
     # if not sqlalchemy.inspect(engine).has_table(table_name):
     #     return None
@@ -33,34 +99,44 @@ def get_table(db_string, table_name, engine=None):
 
     metadata = MetaData()
     table = sqlalchemy.Table(table_name, metadata, autoload_with=engine)
+    _tables[key] = table
     return table
 
 def get_table_len(db_string, table, engine=None):
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
     Session = sessionmaker(bind=engine)
-    session = Session()
-    rows = session.query(table).count()
+    # the engine is shared, so the connection has to go back to its pool
+    with Session() as session:
+        rows = session.query(table).count()
     return rows
     # return engine.scalar(table.count())
 
 def drop_table(db_string, table_name, engine=None):
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
     table = get_table(db_string, table_name, engine)
     if table is not None:
         table.drop(engine)
+    invalidate_table(db_string, table_name)
 
 async def create_market_table(db_string, table_name=None, engine=None, **kwargs):
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
     if not database_exists(engine.url):
         create_db(db_string)
 
     if sqlalchemy.inspect(engine).has_table(table_name):
         return
 
-    meta = MetaData()
+    table = market_table(table_name)
+    table.create(engine, checkfirst=True)
+    return True
+
+def market_table(table_name, meta=None):
+    """Defines the table of market transactions, without creating it"""
+    if meta is None:
+        meta = MetaData()
     # if table_type == 'market':
     #     table = sqlalchemy.Table(
     #         table_name if table_name else table_type,
@@ -101,12 +177,11 @@ async def create_market_table(db_string, table_name=None, engine=None, **kwargs)
     #     table = kwargs['custom_table']
     # else:
     #     return False
-    table.create(engine, checkfirst=True)
-    return True
+    return table
 
 async def create_table(db_string, table, engine=None):
     if not engine:
-        engine = create_engine(db_string)
+        engine = get_engine(db_string)
     if not database_exists(engine.url):
         create_db(db_string)
 
@@ -0,0 +1,129 @@
+import asyncio
+
+import databases
+
+from TREX_Core.utils import db_utils
+from TREX_Core.utils.file_writer import FileWriter
+
+
+class DBWriter:
+    """Writes batches of rows to the database in the background
+
+    Rows are queued by write() and inserted by a drain task over one long-lived connection per database,
+    so callers only wait when the queue is full.
+    Consecutive batches for the same table are inserted together, in a single transaction
+    (with COPY on PostgreSQL, see db_utils.bulk_insert).
+    write() returns a future of the number of rows committed, which is set as soon as the batch's transaction commits
+    (or set to the exception if it could not be written), so callers can wait for their own rows
+    instead of polling the table.
+    flush() waits until everything queued so far has been written, and close() also closes the connections.
+
+    The drain task is started on first use, on the running event loop.
+
+    """
+
+    def __init__(self, max_batches=64):
+        self.max_batches = max_batches
+        self.__queue = None
+        self.__task = None
+        self.__loop = None
+        self.__databases = {}
+
+    def __start(self):
+        loop = asyncio.get_running_loop()
+        if self.__task is not None and not self.__task.done() and self.__loop is loop:
+            return
+
+        # connections and queues belong to the loop they were made in
+        self.__loop = loop
+        self.__databases = {}
+        self.__queue = asyncio.Queue(self.max_batches)
+        self.__task = loop.create_task(self.__drain())
+
+    async def write(self, data, db_string, table):
+        """Queues a batch of rows (dicts) to be inserted into table
+
+        Returns
+        -------
+        asyncio.Future
+            resolves to the number of rows committed
+        """
+        self.__start()
+        committed = self.__loop.create_future()
+        if not data:
+            committed.set_result(0)
+            return committed
+        await self.__queue.put((db_string, table, data, committed))
+        return committed
+
+    async def flush(self):
+        """Waits until all queued rows have been written"""
+        if self.__queue is None or self.__loop is not asyncio.get_running_loop():
+            return
+        await self.__queue.join()
+
+    async def close(self):
+        """Writes the remaining rows, then stops the drain task and closes the connections"""
+        await self.flush()
+        if self.__task is not None:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+        for db in self.__databases.values():
+            await db.disconnect()
+        self.__databases = {}
+        self.__queue = None
+        self.__task = None
+
+    async def __connection(self, db_string):
+        if db_string not in self.__databases:
+            db = databases.Database(db_string)
+            await db.connect()
+            self.__databases[db_string] = db
+        return self.__databases[db_string]
+
+    async def __drain(self):
+        pending = None
+        while True:
+            db_string, table, data, committed = pending if pending else await self.__queue.get()
+            pending = None
+            rows = list(data)
+            batches = [(len(data), committed)]
+            # take the batches already waiting for the same table along
+            while not self.__queue.empty():
+                pending = self.__queue.get_nowait()
+                if pending[0] != db_string or pending[1] is not table:
+                    break
+                rows.extend(pending[2])
+                batches.append((len(pending[2]), pending[3]))
+                pending = None
+
+            try:
+                db = await self.__connection(db_string)
+                async with db.transaction():
+                    await db_utils.bulk_insert(db, table, rows)
+            except Exception as e:
+                print('could not write', len(rows), 'rows to', table.name, e)
+                for _, committed in batches:
+                    if not committed.done():
+                        committed.set_exception(e)
+            else:
+                for rows_len, committed in batches:
+                    if not committed.done():
+                        committed.set_result(rows_len)
+            finally:
+                for _ in batches:
+                    self.__queue.task_done()
+
+
+# one writer per process
+writer = DBWriter()
+# writers for the output sinks that can be selected with study.output_sink
+# the file sinks write to a directory instead of a database, with the same interface
+sinks = {
+    'database': writer,
+    'npz': FileWriter('npz'),
+    'parquet': FileWriter('parquet')
+}
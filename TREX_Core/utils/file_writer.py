@@ -0,0 +1,184 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import sqlalchemy
+
+
+class FileWriter:
+    """Writes batches of rows to append-only columnar files instead of a database
+
+    Each batch becomes a new part file in a directory named after the table, under the output location:
+    <location>/<table name>/part-00000.npz, part-00001.npz, ...
+    Every table is written for one episode, so each episode ends up in its own directory.
+    A rerun of the episode replaces the parts of the previous run.
+
+    Columns are stored as typed arrays, following the column types of the table.
+    String columns (participant IDs, sources) are dictionary-encoded,
+    so they are stored as integer codes and a small array of categories.
+
+    'npz' only needs NumPy, 'parquet' needs pyarrow.
+    The parts of an npz table can be loaded with read_table(), and a parquet table directory can be loaded
+    directly with pyarrow or pandas.
+
+    The interface is the same as DBWriter: write() returns a future of the number of rows written.
+
+    """
+
+    def __init__(self, file_format='npz'):
+        self.file_format = file_format
+        self.__parts = {}
+        self.__pending = set()
+
+    async def write(self, data, location, table):
+        """Writes a batch of rows (dicts) to a new part file of table
+
+        Returns
+        -------
+        asyncio.Future
+            resolves to the number of rows written
+        """
+        if not data:
+            written = asyncio.get_running_loop().create_future()
+            written.set_result(0)
+            return written
+
+        directory = os.path.join(location, table.name)
+        path = os.path.join(directory, f'part-{self.__next_part(directory):05d}.{self.file_format}')
+        # the file is written in a thread, so the caller's loop keeps running
+        written = asyncio.ensure_future(asyncio.to_thread(self.__write_part, path, list(data), table))
+        self.__pending.add(written)
+        written.add_done_callback(self.__pending.discard)
+        return written
+
+    async def flush(self):
+        """Waits until all the parts have been written"""
+        if self.__pending:
+            await asyncio.gather(*self.__pending, return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+
+    def __next_part(self, directory):
+        # parts left by a previous run of the same study and episode, in any format, are removed
+        # the first time the table is written in this run, so they are not read back with the new ones
+        if directory not in self.__parts:
+            os.makedirs(directory, exist_ok=True)
+            for name in os.listdir(directory):
+                if name.startswith('part-'):
+                    os.remove(os.path.join(directory, name))
+            self.__parts[directory] = 0
+        part = self.__parts[directory]
+        self.__parts[directory] += 1
+        return part
+
+    def __write_part(self, path, rows, table):
+        columns = encode_columns(rows, table)
+        try:
+            if self.file_format == 'npz':
+                arrays = {}
+                for name, (values, categories) in columns.items():
+                    arrays[name] = values
+                    if categories is not None:
+                        arrays[name + '.categories'] = categories
+                with open(path, 'wb') as file:
+                    np.savez(file, **arrays)
+
+            elif self.file_format == 'parquet':
+                import pyarrow
+                import pyarrow.parquet
+                arrays = {name: pyarrow.DictionaryArray.from_arrays(
+                              pyarrow.array(values, mask=values < 0), categories)
+                          if categories is not None else pyarrow.array(values)
+                          for name, (values, categories) in columns.items()}
+                pyarrow.parquet.write_table(pyarrow.table(arrays), path)
+
+            else:
+                raise ValueError(f'unknown file format {self.file_format}')
+        except Exception as e:
+            print('could not write', len(rows), 'rows to', path, e)
+            raise
+        return len(rows)
+
+
+def encode_columns(rows, table):
+    """Converts rows (dicts) to one array per column of table
+
+    Returns
+    -------
+    dict
+        column name: (values, categories).
+        For dictionary-encoded string columns, values are int32 codes into categories, with -1 for missing values.
+        For the other columns categories is None.
+        Missing integers are NaN, which makes the column float64.
+        Every column of table is returned, even if no row has it, so all the parts of a table line up row for row.
+    """
+    columns = {}
+    for column in table.columns:
+        values = [row.get(column.name) for row in rows]
+        if isinstance(column.type, sqlalchemy.String):
+            codes = {}
+            encoded = np.fromiter((-1 if value is None else codes.setdefault(value, len(codes)) for value in values),
+                                  dtype=np.int32, count=len(values))
+            columns[column.name] = (encoded, np.array(list(codes), dtype=str))
+        elif isinstance(column.type, sqlalchemy.Boolean):
+            columns[column.name] = (np.array(values, dtype=bool), None)
+        elif isinstance(column.type, sqlalchemy.Integer):
+            dtype = np.float64 if None in values else np.int64
+            columns[column.name] = (np.array([np.nan if value is None else value for value in values], dtype=dtype),
+                                    None)
+        elif isinstance(column.type, (sqlalchemy.Float, sqlalchemy.Numeric)):
+            columns[column.name] = (np.array([np.nan if value is None else value for value in values],
+                                             dtype=np.float64), None)
+        else:
+            # anything else, such as JSON, is stored as JSON text
+            columns[column.name] = (np.array([json.dumps(value) for value in values], dtype=str), None)
+    return columns
+
+
+def read_table(directory, decode=True):
+    """Loads all the npz parts of a table written by FileWriter
+
+    Parameters
+    ----------
+    directory : str
+        the table's directory
+    decode : bool
+        if True, dictionary-encoded columns are returned as strings.
+        Otherwise they are returned as codes, with their categories under '<column>.categories'
+
+    Returns
+    -------
+    dict
+        column name: array, concatenated over all parts
+    """
+    parts = sorted(name for name in os.listdir(directory) if name.startswith('part-') and name.endswith('.npz'))
+    columns = {}
+    for part in parts:
+        with np.load(os.path.join(directory, part)) as arrays:
+            for name in arrays.files:
+                if name.endswith('.categories'):
+                    continue
+                values = arrays[name]
+                categories_name = name + '.categories'
+                if categories_name in arrays.files:
+                    categories = arrays[categories_name]
+                    if decode:
+                        values = np.where(values < 0, '', categories[np.maximum(values, 0)]) if len(categories) \
+                            else np.full(len(values), '')
+                    else:
+                        # codes are per part, so they are remapped to categories shared by all the parts
+                        shared = columns.setdefault(categories_name, [{}])[0]
+                        remap = np.array([shared.setdefault(category, len(shared)) for category in categories.tolist()]
+                                         + [-1], dtype=np.int32)
+                        values = remap[values]
+                columns.setdefault(name, []).append(values)
+
+    table = {}
+    for name, values in columns.items():
+        if name.endswith('.categories'):
+            table[name] = np.array(list(values[0]), dtype=str)
+        else:
+            table[name] = np.concatenate(values)
+    return table
@@ -0,0 +1,35 @@
+import itertools
+import time
+
+import numpy as np
+
+
+class IdAllocator:
+    """Allocates compact ids for bid/ask entries and settlement commits
+
+    Ids are plain integers from a counter that is never reset, so they stay unique across the episodes of a process,
+    and are as short as possible on the wire.
+    On their own they are only unique for their allocator, so each allocator also has a session:
+    the time it was created (microseconds, base 36), which tells the ids of a restarted owner from the ones before.
+    Owner ids and sessions are exchanged once, when a participant joins the market
+    (participants send theirs with join_market, the market replies with its own in market_info),
+    and whoever receives an id keeps it in its globally unique form, see qualify().
+
+    """
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.session = np.base_repr(time.time_ns() // 1000, 36).lower()
+        self.__counter = itertools.count()
+
+    def next(self):
+        """returns the next id"""
+        return next(self.__counter)
+
+
+def qualify(owner_id, session, local_id):
+    """Returns the globally unique form of an id received from owner_id, whose allocator session is session
+
+    Qualified ids are tuples, so the id sent on the wire is local_id (qualified_id[2]).
+    """
+    return owner_id, session, local_id
@@ -1,9 +1,7 @@
-from TREX_Core.utils import utils, db_utils
+from TREX_Core.utils import utils, db_utils, db_writer
 import sqlalchemy
 from sqlalchemy import MetaData, Column
-import asyncio
 import databases
-import tenacity
 
 class Metrics:
     def __init__(self, agent_id, track):
@@ -12,6 +10,8 @@ class Metrics:
         self.__db = {}
         self.__metrics = {}
         self.__metrics_meta = {}
+        # commit futures of the metrics handed to the writer
+        self.__writes = []
         # self.__transactions_count = 0
 
     def add(self, metric_name:str, column_type):
@@ -36,9 +36,10 @@ class Metrics:
         )
         return table
 
-    def update_db_info(self, db_string, table_name):
+    def update_db_info(self, db_string, table_name, sink='database'):
         self.__db['path'] = db_string
         self.__db['table_name'] = table_name + '_' + self.__agent_id
+        self.__db['sink'] = sink
 
     def reset(self):
         self.__db.clear()
@@ -57,11 +58,15 @@ class Metrics:
         if metrics_len > buf_len:
             # a table will be created the first time metrics are being saved
             # this increases the likelihood of complete columnss
+            sink = self.__db.get('sink', 'database')
             if 'table' not in self.__db or self.__db['table'] is None:
                 table_name = self.__db.pop('table_name')
-                await db_utils.create_table(db_string=self.__db['path'],
-                                            table=self.__create_metrics_table(table_name))
-                self.__db['table'] = db_utils.get_table(self.__db['path'], table_name)
+                if sink == 'database':
+                    await db_utils.create_table(db_string=self.__db['path'],
+                                                table=self.__create_metrics_table(table_name))
+                    self.__db['table'] = db_utils.get_table(self.__db['path'], table_name)
+                else:
+                    self.__db['table'] = self.__create_metrics_table(table_name)
 
             if self.__db['table'] is None:
                 return
@@ -70,16 +75,18 @@ class Metrics:
             metrics = [dict(zip(metrics, t)) for t in zip(*metrics.values())]
             self.__metrics = {key: value[metrics_len:] for key, value in self.__metrics.items()}
             # await db_utils.dump_data(metrics, self.__db['path'], self.__db['table'])
-            await asyncio.create_task(db_utils.dump_data(metrics, self.__db['path'], self.__db['table']))
-            await self.__ensure_transactions_complete(metrics_len)
+            # metrics are written in the background, see ensure_metrics_complete
+            self.__writes.append(await db_writer.sinks[sink].write(metrics, self.__db['path'], self.__db['table']))
 
-    @tenacity.retry(wait=tenacity.wait_random(1, 5))
-    async def __ensure_transactions_complete(self, metrics_len):
-        table_len = db_utils.get_table_len(self.__db['path'], self.__db['table'])
-        # numbers don't match all the time for some reason
-        print('comparing recorded metrics vs number of metrics', table_len, metrics_len)
-        if table_len < metrics_len:
-            raise Exception
+    async def ensure_metrics_complete(self):
+        """Waits until all the saved metrics have been committed
+
+        Raises the writer's exception if a batch could not be written.
+        """
+        writes = self.__writes
+        self.__writes = []
+        for write in writes:
+            await write
         return True
             
     async def fetch_one(self, timestamp):
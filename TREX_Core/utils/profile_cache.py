@@ -0,0 +1,68 @@
+import asyncio
+from collections import OrderedDict
+
+from TREX_Core.utils import utils
+
+
+class ProfileCache:
+    """Read-ahead LRU cache of profile readings, fetched from the profile database in fixed-size blocks of time
+
+    Each block covers block_duration seconds of profile rows and is fetched with one range query.
+    At most 'blocks' blocks are kept, the least recently used block is dropped first,
+    so memory stays bounded however long the profile is.
+    Once a read is past the middle of a block, the next block is fetched in the background,
+    so a simulation moving forward in time rarely waits for the database.
+
+    Readings are returned before scaling and rounding (see utils.profile_readings).
+
+    """
+
+    def __init__(self, db, table, block_duration=86400, blocks=3):
+        self.db = db
+        self.table = table
+        self.block_duration = block_duration
+        self.blocks = blocks
+        self.__blocks = OrderedDict()
+        self.__fetching = {}
+
+    async def get(self, timestamp):
+        """Returns the (generation, consumption) readings of the profile row at timestamp, or None if there is none"""
+        block_id, position = divmod(timestamp, self.block_duration)
+        block = await self.__block(block_id)
+        if position >= self.block_duration // 2:
+            self.__prefetch(block_id + 1)
+        return block.get(timestamp)
+
+    async def __block(self, block_id):
+        if block_id in self.__blocks:
+            self.__blocks.move_to_end(block_id)
+            return self.__blocks[block_id]
+        self.__prefetch(block_id)
+        return await self.__fetching[block_id]
+
+    def __prefetch(self, block_id):
+        if block_id in self.__blocks or block_id in self.__fetching:
+            return
+        fetch = asyncio.ensure_future(self.__fetch(block_id))
+        fetch.add_done_callback(lambda fetch: self.__fetched(block_id, fetch))
+        self.__fetching[block_id] = fetch
+
+    def __fetched(self, block_id, fetch):
+        # failed fetches are retried on the next read
+        # background prefetches are never awaited, so their exception is retrieved here
+        if self.__fetching.get(block_id) is fetch:
+            del self.__fetching[block_id]
+        if not fetch.cancelled() and fetch.exception() is not None:
+            print('could not fetch profile block', block_id, 'of', self.table.name, repr(fetch.exception()))
+
+    async def __fetch(self, block_id):
+        start = block_id * self.block_duration
+        query = self.table.select().where(self.table.c.time >= start,
+                                          self.table.c.time < start + self.block_duration)
+        async with self.db.transaction():
+            rows = await self.db.fetch_all(query)
+        block = {row['time']: utils.profile_readings(row) for row in rows}
+        self.__blocks[block_id] = block
+        while len(self.__blocks) > self.blocks:
+            self.__blocks.popitem(last=False)
+        return block
@@ -0,0 +1,215 @@
+"""Loads eGauge style CSV energy profiles into the profile database
+
+Each CSV becomes one profile table, named after the file unless a name is given.
+The CSV needs a time column ('time', 'tstamp' or eGauge's 'Date & Time'), as UNIX timestamps or date strings,
+marking the end of each reading, and either grid and solar+ columns or pre-processed generation and consumption.
+eGauge headers with units such as 'Grid [kWh]' are converted to Wh.
+
+Usage:
+    python -m TREX_Core.utils.profile_ingest --db_string=sqlite:///profiles.db --timezone=America/Vancouver R4.csv
+"""
+import csv
+import os
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import MetaData, Column
+from sqlalchemy_utils import database_exists
+
+from TREX_Core.utils import db_utils, profile_stats, utils
+
+TIME_COLUMNS = ('time', 'tstamp', 'date & time')
+READING_COLUMNS = ('grid', 'solar', 'solar+', 'generation', 'consumption')
+# multipliers to Wh
+UNITS = {'wh': 1, 'kwh': 1000}
+
+
+def profile_table(table_name, reading_columns, meta=None):
+    """Profile table with a primary key (and so an index) on time"""
+    if meta is None:
+        meta = MetaData()
+    columns = [Column('time', sqlalchemy.Integer, primary_key=True)]
+    columns.extend(Column(name, sqlalchemy.Float) for name in reading_columns)
+    return sqlalchemy.Table(table_name, meta, *columns)
+
+
+def ingest(csv_path, db_string, profile_name=None, timezone=None, replace=False, chunk_size=10000):
+    """Loads one CSV into a profile table in a single streaming pass
+
+    While rows are inserted in chunks:
+    generation and consumption are calculated and stored (see utils.profile_readings),
+    the time step size is validated over the whole series,
+    and the profile statistics are accumulated, then written to the _statistics table.
+    Rows go to a staging table that only replaces the profile once the whole CSV is valid,
+    so an invalid profile leaves the database unchanged, even where DDL is not transactional (SQLite).
+
+    Parameters
+    ----------
+    csv_path : str
+    db_string : str
+        profile database, created if it does not exist
+    profile_name : str, optional
+        defaults to the file name without extension
+    timezone : str, optional
+        needed if times are date strings
+    replace : bool
+        replace the profile if it already exists, else raise ValueError
+    chunk_size : int
+        rows per insert
+
+    Returns
+    -------
+    dict
+        the statistics row written for the profile
+    """
+    if profile_name is None:
+        profile_name = os.path.splitext(os.path.basename(csv_path))[0]
+
+    engine = db_utils.get_engine(db_string)
+    if not database_exists(engine.url):
+        db_utils.create_db(db_string)
+
+    with open(csv_path, newline='') as file:
+        reader = csv.reader(file)
+        time_index, readings = _parse_header(next(reader), csv_path)
+        # generation and consumption are always stored, calculated if the CSV does not have them
+        columns = [name for name in readings if name not in profile_stats.READINGS]
+        staging = profile_table('_ingest_' + profile_name, [*columns, *profile_stats.READINGS])
+
+        with engine.begin() as connection:
+            exists = sqlalchemy.inspect(connection).has_table(profile_name)
+            if exists and not replace:
+                raise ValueError(f'Profile {profile_name} already exists')
+            staging.drop(connection, checkfirst=True)
+            staging.create(connection)
+
+        try:
+            with engine.begin() as connection:
+                statistics = _load_rows(connection, staging, reader, time_index, readings, timezone,
+                                        profile_name, chunk_size)
+                if exists:
+                    sqlalchemy.Table(profile_name, MetaData()).drop(connection)
+                quote = connection.dialect.identifier_preparer.quote
+                connection.execute(sqlalchemy.text(
+                    f'ALTER TABLE {quote(staging.name)} RENAME TO {quote(profile_name)}'))
+                profile_stats.write_statistics(connection, statistics)
+        except Exception:
+            with engine.begin() as connection:
+                staging.drop(connection, checkfirst=True)
+            raise
+
+    db_utils.invalidate_table(db_string, profile_name)
+    db_utils.invalidate_table(db_string, '_statistics')
+    return statistics
+
+
+def _load_rows(connection, table, reader, time_index, readings, timezone, profile_name, chunk_size):
+    """Inserts the CSV rows in chunks, validating the time step size and accumulating statistics on the way
+
+    Returns the statistics row of the profile
+    """
+    running = {reading: profile_stats.RunningStatistics() for reading in profile_stats.READINGS}
+    series = {'first': None, 'last': None, 'step': None, 'rows': 0}
+    chunk = []
+    for line in reader:
+        if not line:
+            continue
+        row = _parse_row(line, time_index, readings, timezone)
+        _check_interval(series, row['time'], profile_name)
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            _insert_chunk(connection, table, chunk, running)
+            chunk = []
+    _insert_chunk(connection, table, chunk, running)
+
+    if series['step'] is None:
+        raise ValueError(f'Profile {profile_name} needs at least 2 rows')
+    statistics = {
+        'name': profile_name,
+        'time_start': min(series['first'], series['last']),
+        'time_end': max(series['first'], series['last']),
+        'time_step_size': abs(series['step']),
+        'row_count': series['rows']
+    }
+    for reading in profile_stats.READINGS:
+        statistics.update(running[reading].summary(reading))
+    return statistics
+
+
+def _parse_header(header, csv_path):
+    """Returns the index of the time column, and the index and Wh multiplier of each reading column, by name"""
+    time_index = None
+    readings = {}
+    for index, title in enumerate(header):
+        name, _, unit = title.partition('[')
+        name = name.strip().lower()
+        if name in TIME_COLUMNS:
+            time_index = index
+        elif name in READING_COLUMNS:
+            readings[name] = (index, UNITS.get(unit.strip(' ]').lower(), 1))
+    if time_index is None:
+        raise ValueError(f'{csv_path} has no time column')
+    if not {'grid', 'solar+'} <= readings.keys() and not {'generation', 'consumption'} <= readings.keys():
+        raise ValueError(f'{csv_path} needs grid and solar+, or generation and consumption columns')
+    return time_index, readings
+
+
+def _parse_row(line, time_index, readings, timezone):
+    value = line[time_index].strip()
+    try:
+        timestamp = int(float(value))
+    except ValueError:
+        timestamp = utils.timestr_to_timestamp(value, timezone)
+
+    row = {'time': timestamp}
+    for name, (index, multiplier) in readings.items():
+        value = line[index].strip()
+        row[name] = float(value) * multiplier if value else None
+
+    if None in row.values():
+        row.setdefault('generation', None)
+        row.setdefault('consumption', None)
+    else:
+        row['generation'], row['consumption'] = utils.profile_readings(row)
+    return row
+
+
+def _check_interval(series, timestamp, profile_name):
+    # eGauge exports newest first, so the series may run either way, as long as it runs one way in equal steps
+    last = series['last']
+    if last is not None:
+        step = timestamp - last
+        if series['step'] is None:
+            series['step'] = step
+        if not step or step != series['step']:
+            raise ValueError(f'Profile {profile_name} time intervals are not consistent, at {last} to {timestamp}')
+    else:
+        series['first'] = timestamp
+    series['last'] = timestamp
+    series['rows'] += 1
+
+
+def _insert_chunk(connection, table, chunk, running):
+    if not chunk:
+        return
+    connection.execute(table.insert(), chunk)
+    for reading in profile_stats.READINGS:
+        running[reading].update(np.array([row[reading] for row in chunk], dtype=np.float64))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Loads eGauge style CSV energy profiles into the profile database')
+    parser.add_argument('csv_paths', nargs='+', help='one profile per CSV')
+    parser.add_argument('--db_string', required=True, help='profile database')
+    parser.add_argument('--name', default=None, help='profile name, if a single CSV is given. Defaults to the file name')
+    parser.add_argument('--timezone', default=None, help='timezone of date strings in the time column')
+    parser.add_argument('--replace', action='store_true', help='replace profiles that already exist')
+    args = parser.parse_args()
+
+    if args.name and len(args.csv_paths) > 1:
+        parser.error('--name can only be used with a single CSV')
+    for path in args.csv_paths:
+        result = ingest(path, args.db_string, args.name, args.timezone, args.replace)
+        print(result['name'], result['row_count'], 'rows, time step', result['time_step_size'], 's')
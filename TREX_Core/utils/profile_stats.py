@@ -0,0 +1,232 @@
+"""Pre-calculated profile statistics, stored in the _statistics table of the profile database
+
+Participants read them through get_profile_stats, for example to normalize observations with Z scores.
+Profiles loaded with utils.profile_ingest get their statistics during ingestion,
+the statistics of profiles already in the database can be built with:
+
+Usage:
+    python -m TREX_Core.utils.profile_stats --db_string=sqlite:///profiles.db [profile names, all by default]
+"""
+import math
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy import MetaData, Column, select
+
+from TREX_Core.utils import db_utils, utils
+
+# statistics kept for each reading of a profile
+READINGS = ('generation', 'consumption')
+STATISTICS = ('mean', 'std', 'min', 'max')
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+class RunningStatistics:
+    """Streaming count, mean, standard deviation, min, max and quantiles of a series, updated one chunk at a time
+
+    Chunks are combined with the parallel form of Welford's algorithm (Chan et al.),
+    so memory stays constant and the result does not depend on how the series is split.
+    NaN values are ignored. The standard deviation is the population standard deviation.
+
+    Quantiles come from a summary of at most 'resolution' weighted points:
+    once it grows past that, it is compressed to points evenly spaced in rank.
+    They are exact up to 'resolution' values, and within about 1 / resolution in rank after that.
+
+    """
+
+    def __init__(self, resolution=1000):
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self.resolution = resolution
+        self.__m2 = 0.0
+        self.__points = np.empty(0)
+        self.__weights = np.empty(0)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+
+        count = values.size
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.__m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+        chunk_min, chunk_max = float(values.min()), float(values.max())
+        self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+        self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+
+        points = np.concatenate((self.__points, values))
+        weights = np.concatenate((self.__weights, np.ones(count)))
+        order = np.argsort(points, kind='stable')
+        self.__points, self.__weights = points[order], weights[order]
+        if self.__points.size > self.resolution:
+            self.__compress()
+
+    def __compress(self):
+        ranks = np.cumsum(self.__weights) - self.__weights / 2
+        targets = (np.arange(self.resolution) + 0.5) * self.count / self.resolution
+        self.__points = np.interp(targets, ranks, self.__points)
+        self.__weights = np.full(self.resolution, self.count / self.resolution)
+
+    @property
+    def std(self):
+        if not self.count:
+            return None
+        return math.sqrt(self.__m2 / self.count)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        ranks = np.cumsum(self.__weights) - self.__weights / 2
+        return float(np.interp(q * self.count, ranks, self.__points))
+
+    def summary(self, prefix):
+        """Returns the statistics as columns of the statistics table, named <prefix>_<statistic>"""
+        summary = {
+            prefix + '_mean': self.mean if self.count else None,
+            prefix + '_std': self.std,
+            prefix + '_min': self.min,
+            prefix + '_max': self.max
+        }
+        for q in QUANTILES:
+            summary[f'{prefix}_{quantile_name(q)}'] = self.quantile(q)
+        return summary
+
+
+def quantile_name(q):
+    """p05 for the 5th percentile, p50 for the median..."""
+    return f'p{round(q * 100):02d}'
+
+
+def statistics_table(meta=None):
+    """Table of pre-calculated profile statistics, one row per profile
+
+    Besides the statistics of each reading, it records the time range and the validated time step size
+    of the profile, so a simulation can use them without checking the profile again.
+    """
+    if meta is None:
+        meta = MetaData()
+    columns = [
+        Column('name', sqlalchemy.String, primary_key=True),
+        Column('time_start', sqlalchemy.Integer),
+        Column('time_end', sqlalchemy.Integer),
+        Column('time_step_size', sqlalchemy.Integer),
+        Column('row_count', sqlalchemy.Integer)]
+    for reading in READINGS:
+        for statistic in STATISTICS + tuple(quantile_name(q) for q in QUANTILES):
+            columns.append(Column(f'{reading}_{statistic}', sqlalchemy.Float))
+    return sqlalchemy.Table('_statistics', meta, *columns)
+
+
+def write_statistics(connection, statistics):
+    """Writes (or replaces) the statistics row of one profile
+
+    Columns missing from an existing _statistics table are added first.
+
+    Args:
+        connection: SQLAlchemy connection, statistics are written as part of its transaction
+        statistics (dict): row of the statistics table
+    """
+    table = statistics_table()
+    inspector = sqlalchemy.inspect(connection)
+    if inspector.has_table(table.name):
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        quote = connection.dialect.identifier_preparer.quote
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(sqlalchemy.text(
+                    f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} '
+                    f'{column.type.compile(dialect=connection.dialect)}'))
+    else:
+        table.create(connection)
+    connection.execute(table.delete().where(table.c.name == statistics['name']))
+    connection.execute(table.insert(), [statistics])
+
+
+def build(db_string, profile_names=None, chunk_size=100000):
+    """Calculates and stores the statistics of profiles already in the profile database
+
+    Each profile is read in chunks of chunk_size rows, so memory stays bounded however long the profile is.
+    The time step size is only recorded if it is the same over the whole profile.
+
+    Parameters
+    ----------
+    db_string : str
+        profile database
+    profile_names : iterable, optional
+        profiles to build statistics for. Defaults to every table not starting with '_'
+    chunk_size : int
+
+    Returns
+    -------
+    list
+        the statistics rows written
+    """
+    engine = db_utils.get_engine(db_string)
+    if profile_names is None:
+        profile_names = [name for name in sqlalchemy.inspect(engine).get_table_names() if not name.startswith('_')]
+
+    written = []
+    for profile_name in profile_names:
+        table = db_utils.get_table(db_string, profile_name, engine)
+        statistics = _table_statistics(engine, table, chunk_size)
+        with engine.begin() as connection:
+            write_statistics(connection, statistics)
+        written.append(statistics)
+    db_utils.invalidate_table(db_string, '_statistics')
+    return written
+
+
+def _table_statistics(engine, table, chunk_size):
+    running = {reading: RunningStatistics() for reading in READINGS}
+    reading_columns = [name for name in ('generation', 'consumption', 'grid', 'solar+') if name in table.c]
+    times = {'first': None, 'last': None, 'steps': set(), 'rows': 0}
+
+    with engine.connect() as connection:
+        result = connection.execution_options(yield_per=chunk_size).execute(
+            select(table).order_by(table.c.time))
+        for rows in result.mappings().partitions():
+            time = np.array([row['time'] for row in rows], dtype=np.int64)
+            if times['last'] is not None:
+                time_steps = np.diff(time, prepend=times['last'])
+            else:
+                times['first'] = int(time[0])
+                time_steps = np.diff(time)
+            times['steps'].update(np.unique(time_steps).tolist())
+            times['last'] = int(time[-1])
+            times['rows'] += len(rows)
+
+            columns = {name: np.array([row[name] for row in rows], dtype=np.float64) for name in reading_columns}
+            for reading, values in zip(READINGS, utils.profile_readings(columns)):
+                running[reading].update(values)
+
+    statistics = {
+        'name': table.name,
+        'time_start': times['first'],
+        'time_end': times['last'],
+        'time_step_size': times['steps'].pop() if len(times['steps']) == 1 else None,
+        'row_count': times['rows']
+    }
+    for reading in READINGS:
+        statistics.update(running[reading].summary(reading))
+    return statistics
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Builds the _statistics table of a profile database')
+    parser.add_argument('profile_names', nargs='*', help='profiles to build statistics for, all by default')
+    parser.add_argument('--db_string', required=True, help='profile database')
+    args = parser.parse_args()
+
+    for result in build(args.db_string, args.profile_names or None):
+        print(result['name'], result['row_count'], 'rows, time step', result['time_step_size'], 's')
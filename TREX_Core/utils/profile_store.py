@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from TREX_Core.utils import db_utils, utils
+
+
+class ProfileStore:
+    """Read-only view of the energy profiles of a study, memory-mapped from a file built by build()
+
+    The store holds the generation and consumption readings (Wh, before scaling and rounding)
+    of every profile in the study, for every step of the study window:
+    <location>/profiles.npy is a float64 array of shape (profiles, steps, 2), generation then consumption,
+    <location>/index.json holds the window and the position of each profile in the array.
+    Missing rows are NaN.
+
+    The array is memory-mapped, so every participant process on the host shares the same pages
+    through the OS page cache, and windows of it are returned without copying.
+
+    """
+
+    def __init__(self, location):
+        index = load_index(location)
+        if index is None:
+            raise FileNotFoundError(f'no profile store in {location}')
+        self.start_time = index['start_time']
+        self.duration = index['duration']
+        self.steps = index['steps']
+        self.__profiles = index['profiles']
+        self.__readings = np.load(os.path.join(location, 'profiles.npy'), mmap_mode='r')
+
+    def __contains__(self, profile_name):
+        return profile_name in self.__profiles
+
+    def window(self, profile_name, start_time, duration, steps):
+        """Returns the readings of up to 'steps' steps, starting from the step that starts at start_time
+
+        Returns
+        -------
+        numpy.ndarray or None
+            read-only (steps, 2) view into the store, shorter if the store ends first.
+            None if the store does not have the profile, or the window does not line up with the store
+        """
+        if profile_name not in self.__profiles or duration != self.duration:
+            return None
+        offset, misaligned = divmod(start_time - self.start_time, duration)
+        if misaligned or not 0 <= offset < self.steps:
+            return None
+        return self.__readings[self.__profiles[profile_name], offset:offset + steps]
+
+
+def load_index(location):
+    """Returns the index of the profile store in location, or None if none was built there"""
+    path = os.path.join(location, 'index.json')
+    if not os.path.isfile(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def build(db_string, profile_names, location, start_time, duration, steps):
+    """Builds the profile store of a study from the profile database
+
+    Profiles are read one at a time and written straight into the memory-mapped file, so memory stays bounded.
+    The store is only rebuilt if the profiles or the window changed since it was last built.
+    Files are written under temporary names and swapped in when complete,
+    so a participant never maps a partially built store.
+
+    Parameters
+    ----------
+    db_string : str
+        profile database
+    profile_names : iterable
+        names of the profile tables to include
+    location : str
+        directory of the store
+    start_time : int
+        UNIX timestamp of the start of the first step
+    duration : int
+        duration of a step in seconds
+    steps : int
+        number of steps to store
+
+    Returns
+    -------
+    bool
+        True if the store was (re)built
+    """
+    index = {
+        'start_time': start_time,
+        'duration': duration,
+        'steps': steps,
+        'profiles': {name: position for position, name in enumerate(sorted(profile_names))}
+    }
+    if load_index(location) == index:
+        return False
+
+    os.makedirs(location, exist_ok=True)
+    # without an index, the store reads as not built until the new one is complete
+    index_path = os.path.join(location, 'index.json')
+    if os.path.isfile(index_path):
+        os.remove(index_path)
+    path = os.path.join(location, 'profiles.npy')
+    readings = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=np.float64,
+                                         shape=(len(index['profiles']), steps, 2))
+    readings[:] = np.nan
+
+    engine = db_utils.get_engine(db_string)
+    # profile rows are timestamped at the end of the slot
+    first, last = start_time + duration, start_time + duration * steps
+    with Session(engine) as session:
+        for name, position in index['profiles'].items():
+            table = db_utils.get_table(db_string, name, engine)
+            query = select(table).where(table.c.time.between(first, last))
+            for row in session.execute(query).mappings():
+                elapsed = row['time'] - start_time
+                if elapsed % duration:
+                    continue
+                readings[position, elapsed // duration - 1] = utils.profile_readings(row)
+    readings.flush()
+    del readings
+    os.replace(path + '.tmp', path)
+
+    with open(index_path + '.tmp', 'w') as file:
+        json.dump(index, file)
+    os.replace(index_path + '.tmp', index_path)
+    return True
@@ -6,6 +6,14 @@ source_info = {
     "bess": "dispatch"
 }
 
+# compact integer codes for classifiable sources
+sources = tuple(source_info)
+source_codes = {source: code for code, source in enumerate(sources)}
+
+# compact integer codes for source types, so that a source only has to be classified once
+source_types = ('dispatch', 'non_dispatch')
+source_type_codes = {source: source_types.index(source_type) for source, source_type in source_info.items()}
+
 async def classify(source):
     source = source.lower()
     if source in source_info:
@@ -1,5 +1,6 @@
 
 import random
+import numpy as np
 from datetime import datetime
 import pytz
 from dateutil.parser import parse as timeparse
@@ -27,6 +28,19 @@ def timestr_to_timestamp(time_string:str, timezone:str):
     timestamp = pytz.timezone(timezone).localize(timeparse(time_string))
     return int(timestamp.timestamp())
 
+def time_step(timestamp, start_time, duration):
+    """Converts the UNIX timestamp at the start of a time slot to the slot's step
+
+    Time slots are identified by integer steps: the number of round durations since the start of the episode.
+    The first round of an episode is step 0.
+    """
+    return (timestamp - start_time) // duration
+
+def step_interval(step, start_time, duration):
+    """Converts a step back to the (start, end) UNIX timestamps of its time slot"""
+    start = start_time + step * duration
+    return start, start + duration
+
 def process_profile(row, gen_scale=1, load_scale=1):
     """
         Converts a row of data from energy profile database to format usable by TREX
@@ -63,17 +77,47 @@ def process_profile(row, gen_scale=1, load_scale=1):
         """
 
     if row is not None:
-        # if the data has been pre-processed
-        if 'generation' in row and 'consumption' in row:
-            consumption = int(round(load_scale * row['consumption'], 0))
-            generation = int(round(gen_scale * row['generation'], 0))
-        else:
-            # else, calculate generation and consumption on the fly
-            consumption = int(round(load_scale * (row['grid'] + row['solar+']), 0))
-            generation = int(round(gen_scale * row['solar+'], 0))
-        return generation, consumption
+        generation, consumption = profile_readings(row)
+        return int(round(gen_scale * generation, 0)), int(round(load_scale * consumption, 0))
     return 0, 0
 
+def profile_readings(row):
+    """Returns the generation and consumption of a profile row in Wh, before scaling and rounding
+
+    See process_profile for the row format.
+    Also works on a dict of column arrays, returning generation and consumption arrays.
+    """
+    # if the data has been pre-processed
+    if 'generation' in row and 'consumption' in row:
+        return row['generation'], row['consumption']
+    # else, calculate generation and consumption on the fly
+    return row['solar+'], row['grid'] + row['solar+']
+
+def process_profiles(columns, gen_scale=1, load_scale=1):
+    """Batch version of process_profile, for whole columns of profile data at once
+
+    Parameters
+    ----------
+    columns : dict
+        equal length arrays (or sequences) by column name, with the same columns as a row for process_profile,
+        for example from a bulk query or a file. Missing values (NaN) convert to 0, like a missing row.
+    gen_scale : float
+    load_scale : float
+
+    Returns
+    -------
+    generation:numpy.ndarray, consumption:numpy.ndarray
+        int32 arrays in units of Wh, rounded exactly like process_profile (half to even)
+    """
+    columns = {name: np.asarray(columns[name], dtype=np.float64) for name in ('generation', 'consumption', 'grid', 'solar+')
+               if name in columns}
+    generation, consumption = profile_readings(columns)
+    return _round_scaled(generation, gen_scale), _round_scaled(consumption, load_scale)
+
+def _round_scaled(values, scale):
+    # np.rint rounds half to even like round()
+    return np.nan_to_num(np.rint(scale * values), nan=0).astype(np.int32)
+
 def energy_to_power(generation, consumption, duration=60, net_load=False):
     # convert from energy (Wh) to average power during interval (s) to kW
     duration_hour_fraction = duration / 3600
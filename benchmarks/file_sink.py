@@ -0,0 +1,70 @@
+"""Compares writing and loading market transactions with the database writer against the npz file sink
+
+The database defaults to a temporary SQLite file. Set TREX_BENCHMARK_DB to a database URL to use another one.
+Loading reads every row of the table back, as post-processing does.
+
+Usage:
+    python -m benchmarks.file_sink  (from the repository root)
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+import databases
+
+from TREX_Core.utils import db_utils
+from TREX_Core.utils.db_writer import DBWriter
+from TREX_Core.utils.file_writer import FileWriter, read_table
+from benchmarks.db_insert import make_rows
+
+
+async def database_round_trip(batches, db_string, table_name):
+    await db_utils.create_market_table(db_string, table_name)
+    table = db_utils.get_table(db_string, table_name)
+    writer = DBWriter()
+    start = time.perf_counter()
+    for batch in batches:
+        await writer.write(batch, db_string, table)
+    await writer.close()
+    written = time.perf_counter()
+    async with databases.Database(db_string) as db:
+        rows = await db.fetch_all(table.select())
+    columns = {column.name: [row[column.name] for row in rows] for column in table.columns}
+    loaded = time.perf_counter()
+    assert len(columns['quantity']) == sum(len(batch) for batch in batches)
+    db_utils.drop_table(db_string, table_name)
+    return written - start, loaded - written
+
+
+async def file_round_trip(batches, location, table_name):
+    table = db_utils.market_table(table_name)
+    writer = FileWriter('npz')
+    start = time.perf_counter()
+    for batch in batches:
+        await writer.write(batch, location, table)
+    await writer.close()
+    written = time.perf_counter()
+    columns = read_table(os.path.join(location, table_name))
+    loaded = time.perf_counter()
+    assert len(columns['quantity']) == sum(len(batch) for batch in batches)
+    return written - start, loaded - written
+
+
+async def main():
+    location = tempfile.mkdtemp()
+    db_string = os.environ.get('TREX_BENCHMARK_DB')
+    if not db_string:
+        db_string = 'sqlite:///' + os.path.join(location, 'benchmark.db')
+    print(db_string.split('://')[0], 'vs npz')
+    print(f"{'rows':>8} {'batch':>6} {'db write (s)':>13} {'db load (s)':>12} {'npz write (s)':>14} {'npz load (s)':>13}")
+    for n_rows, batch_size in ((10000, 1000), (50000, 10000)):
+        rows = make_rows(n_rows)
+        batches = [rows[idx:idx + batch_size] for idx in range(0, n_rows, batch_size)]
+        db_write, db_load = await database_round_trip(batches, db_string, f'benchmark_{n_rows}')
+        file_write, file_load = await file_round_trip(batches, location, f'benchmark_{n_rows}')
+        print(f'{n_rows:>8} {batch_size:>6} {db_write:>13.3f} {db_load:>12.3f} {file_write:>14.3f} {file_load:>13.3f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+"""Compares entry/commit id generation with cuid2 against IdAllocator, and checks that ids never collide in a market
+
+The check runs a real Market and real Participants over two episodes, restarts all of them (as new processes would),
+and runs one more episode. Messages go through the market's and participants' message handlers,
+encoded as they would be on the wire. Ids are sent as plain integers, and the owner id and id session of the
+participants and the market are only sent when joining the market. Every entry id and commit id sent is qualified
+with them, as on the receiving side, and checked for collisions. The check raises AssertionError on any collision,
+so the script exits with an error.
+
+Usage:
+    python -m benchmarks.ids  (from the repository root)
+"""
+import asyncio
+import collections
+import json
+import os
+import random
+import tempfile
+import time
+
+from cuid2 import Cuid
+from gmqtt import Message
+
+from TREX_Core.markets.base.DoubleAuction import Market
+from TREX_Core.markets.client import Client as MarketClient
+from TREX_Core.participants.base import Participant
+from TREX_Core.participants.ns_common import NSDefault
+from TREX_Core.utils import db_writer
+from TREX_Core.utils.id_allocator import IdAllocator, qualify
+
+MARKET_ID = 'market'
+DURATION = 60
+PARTICIPANT_EVENTS = {'market_info', 'bid_ack', 'ask_ack', 'orders_ack', 'settled'}
+
+
+def cuid_ids(n_ids):
+    return [Cuid().generate(6) for _ in range(n_ids)]
+
+
+def allocator_ids(n_ids):
+    ids = IdAllocator('participant')
+    return [ids.next() for _ in range(n_ids)]
+
+
+def timed(fn, n_ids, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(n_ids)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class Loopback:
+    """Stands in for the MQTT broker, delivering messages between the market and participants in process"""
+
+    def __init__(self):
+        self.market = None
+        self.participants = {}
+        self.sent = []
+        self.__pending = set()
+
+    def publish(self, topic, payload, **kwargs):
+        # payloads are encoded and decoded the same way as over MQTT
+        message = {'topic': topic, 'payload': Message(topic, payload).payload.decode()}
+        self.sent.append(message)
+        delivery = asyncio.ensure_future(self.__deliver(message))
+        self.__pending.add(delivery)
+        delivery.add_done_callback(self.__pending.discard)
+
+    async def __deliver(self, message):
+        path = message['topic'].split('/')
+        if path[-1] == 'start_round':
+            # participants only send their meter data, as their own rounds are not run
+            start_time, _, _, _, episode_start = json.loads(message['payload'])
+            step = (start_time - episode_start) // DURATION
+            for participant_id in self.participants:
+                self.publish('/'.join([MARKET_ID, 'meter']), [participant_id, step, {
+                    'generation': {'solar': 0, 'bess': 0},
+                    'load': {'bess': {'solar': 0}, 'other': {'solar': 0, 'bess': 0, 'ext': 0}}}])
+        elif len(path) == 3 and path[1] in self.participants:
+            if path[2] in PARTICIPANT_EVENTS:
+                await self.participants[path[1]].process_message(message)
+        elif len(path) == 2:
+            await self.market.process_message(message)
+
+    async def wait(self):
+        while self.__pending:
+            await asyncio.gather(*self.__pending)
+
+
+async def run_process(loopback, participant_ids, episodes, output_db, rng, n_steps=20):
+    """Runs a market and its participants from a fresh start, as new processes would"""
+    market = Market(MARKET_ID, client=loopback, timezone='America/Vancouver', output_db=output_db,
+                    grid_params={'price': 0.069, 'fee_ratio': 1.1}, close_steps=2)
+    # the market's message handlers, without connecting to a broker
+    loopback.market = MarketClient.__new__(MarketClient)
+    loopback.market.market = market
+    loopback.market.client = loopback
+    participants = {participant_id: Participant(loopback, participant_id, MARKET_ID, '', output_db,
+                                                trader={'type': 'basic_trader'})
+                    for participant_id in participant_ids}
+    loopback.participants = {participant_id: NSDefault(participant)
+                             for participant_id, participant in participants.items()}
+    for participant in participants.values():
+        await participant.join_market()
+    await loopback.wait()
+
+    ledger_commits = collections.Counter()
+    for episode in episodes:
+        await loopback.market.process_message({'topic': '/'.join([MARKET_ID, 'simulation', 'start_episode']),
+                                               'payload': f'{{"episode": "{episode}"}}'})
+        for participant in participants.values():
+            participant.reset()
+        start_time = 1_600_000_000 - 1_600_000_000 % DURATION
+        for step in range(n_steps):
+            if step:
+                for participant in participants.values():
+                    # orders for the slot settled in this round
+                    await participant.bid(step + 1, quantity=rng.randint(1, 50), price=rng.uniform(0.05, 0.15))
+                    await participant.ask(step + 1, quantity=rng.randint(1, 50), price=rng.uniform(0.05, 0.15),
+                                          source='solar')
+                await loopback.wait()
+            # a round only completes once both parties confirmed every settlement, which needs their ids to match
+            await asyncio.wait_for(market.step(DURATION, sim_params={'time': start_time + step * DURATION,
+                                                                     'duration': DURATION}), 30)
+            await loopback.wait()
+
+        for participant in participants.values():
+            for settlements in participant._Participant__ledger.settled.values():
+                for commits in settlements.values():
+                    ledger_commits.update(commits.keys())
+        await loopback.market.process_message({'topic': '/'.join([MARKET_ID, 'simulation', 'end_episode']),
+                                               'payload': ''})
+        await loopback.wait()
+    return ledger_commits
+
+
+async def check_uniqueness(n_participants=20):
+    """Returns the number of entry and commit ids sent, raises AssertionError if any of them collide"""
+    loopback = Loopback()
+    output_db = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'ids.db')
+    rng = random.Random(0)
+    participant_ids = [f'R{idx}' for idx in range(n_participants)]
+    ledger_commits = await run_process(loopback, participant_ids, ('1', '2'), output_db, rng)
+    # restart, with the same participant and market ids
+    ledger_commits += await run_process(loopback, participant_ids, ('3',), output_db, rng)
+    await db_writer.writer.close()
+
+    entries = collections.Counter()
+    commits = collections.Counter()
+    # the id sessions in effect, from the latest handshake sent before each message
+    participant_sessions = {}
+    market_sessions = {}
+    for message in loopback.sent:
+        path = message['topic'].split('/')
+        event = path[-1]
+        if event == 'join_market':
+            client_data = json.loads(message['payload'])
+            participant_sessions[client_data['id']] = client_data['session']
+        elif event == 'market_info':
+            market_sessions[path[1]] = json.loads(message['payload'])['session']
+        elif event in ('bid', 'ask'):
+            entry = json.loads(message['payload'])
+            assert isinstance(entry[0], int), f'entry id is not an integer: {entry[0]!r}'
+            entries[qualify(entry[1], participant_sessions[entry[1]], entry[0])] += 1
+        elif event == 'settled':
+            settlement = json.loads(message['payload'])
+            # batched messages are lists of settlements
+            for settlement in settlement if isinstance(settlement[0], list) else [settlement]:
+                assert isinstance(settlement[0], int), f'commit id is not an integer: {settlement[0]!r}'
+                commits[qualify(MARKET_ID, market_sessions[path[1]], settlement[0])] += 1
+
+    assert entries and commits, 'no entries were settled'
+    collisions = [entry_id for entry_id, count in entries.items() if count > 1]
+    assert not collisions, f'entry ids sent more than once: {collisions[:5]}'
+    # every commit is sent once to the buyer and once to the seller
+    collisions = [commit_id for commit_id, count in commits.items() if count != 2]
+    assert not collisions, f'commit ids used by more than one settlement: {collisions[:5]}'
+    collisions = [commit_id for commit_id, count in ledger_commits.items() if count > 2]
+    assert not collisions, f'commit ids recorded more than once in ledgers: {collisions[:5]}'
+    return len(entries), len(commits)
+
+
+if __name__ == '__main__':
+    print(f"{'ids':>8} {'cuid2 (ms)':>11} {'allocator (ms)':>15}")
+    for n_ids in (1000, 10000, 100000):
+        print(f'{n_ids:>8} {timed(cuid_ids, n_ids) * 1e3:>11.2f} {timed(allocator_ids, n_ids) * 1e3:>15.2f}')
+    n_entries, n_commits = asyncio.run(check_uniqueness())
+    print(f'{n_entries} entry ids and {n_commits} commit ids over 3 episodes and a restart, no collisions')
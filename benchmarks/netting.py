@@ -0,0 +1,126 @@
+"""Checks that netting settlements ('net_settlements' in the market configuration) does not change energy exchange
+
+The same orders and meter data are sent to a market with and without netting. Participants place several orders
+per slot, so that the same buyer and seller trade more than once, and generate and consume random quantities,
+so that sellers are often short of what they settled and buyers often settle more than they consume.
+For each participant, the quantities bought and sold in physical and in financial transactions must be the same
+with and without netting. The check raises AssertionError otherwise, so the script exits with an error.
+
+Usage:
+    python -m benchmarks.netting  (from the repository root)
+"""
+import asyncio
+import collections
+import json
+import random
+
+from TREX_Core.markets.base.DoubleAuction import Market
+
+DURATION = 60
+START_TIME = 1_600_000_000 - 1_600_000_000 % 3600
+
+
+class Client:
+    """Stands in for the MQTT client of the market, sending meter data and confirming settlements"""
+
+    def __init__(self, meters):
+        self.market = None
+        self.meters = meters
+        self.settled = 0
+        self.__pending = set()
+
+    def publish(self, topic, payload, **kwargs):
+        # payloads are encoded and decoded the same way as over MQTT
+        payload = json.loads(json.dumps(payload))
+        event = topic.split('/')[-1]
+        if event == 'start_round':
+            step = (payload[0] - payload[4]) // DURATION
+            for participant_id, meters in self.meters.items():
+                meter = json.loads(json.dumps(meters[step]))
+                self.__send(self.market.meter_data([participant_id, step, meter]))
+        elif event == 'settled':
+            self.settled += 1
+            commit_ids = [settlement[0] for settlement in payload] if isinstance(payload[0], list) else payload[0]
+            self.__send(self.market.settlement_delivered({topic.split('/')[1]: commit_ids}))
+
+    def __send(self, coroutine):
+        delivery = asyncio.ensure_future(coroutine)
+        self.__pending.add(delivery)
+        delivery.add_done_callback(self.__pending.discard)
+
+
+def make_round(participant_ids, n_steps, n_orders, rng):
+    """Returns the orders and meter data of every participant, for every slot"""
+    orders = {}
+    meters = {participant_id: [] for participant_id in participant_ids}
+    for step in range(n_steps):
+        orders[step] = []
+        for participant_id in participant_ids:
+            for idx in range(n_orders):
+                entry_id = step * n_orders + idx
+                quantity = rng.randint(1, 30)
+                price = round(rng.uniform(0.05, 0.15), 4)
+                if rng.random() < 0.5:
+                    orders[step].append(('bid', [entry_id, participant_id, quantity, price, step]))
+                else:
+                    source = rng.choice(('solar', 'solar', 'bess'))
+                    orders[step].append(('ask', [entry_id, participant_id, quantity, price, step, source]))
+            meters[participant_id].append({
+                'generation': {'solar': rng.randint(0, 60), 'bess': rng.randint(0, 20)},
+                'load': {'bess': {'solar': 0}, 'other': {'solar': 0, 'bess': 0, 'ext': rng.randint(0, 80)}}})
+    return orders, meters
+
+
+async def run(orders, meters, **kwargs):
+    """Returns the transactions of the market, and the number of settlement messages sent"""
+    client = Client(meters)
+    market = Market('market', client=client, timezone='UTC', output_db='sqlite://',
+                    grid_params={'price': 0.069, 'fee_ratio': 1.1}, close_steps=2, **kwargs)
+    client.market = market
+    for participant_id in meters:
+        await market.participant_connected({'id': participant_id, 'sid': participant_id})
+
+    n_steps = len(orders)
+    for step in range(n_steps):
+        # orders for the slot settled in this round, from the first round on
+        for side, entry in orders.get(step + 1, []) if step else []:
+            await (market.submit_bid(entry) if side == 'bid' else market.submit_ask(entry))
+        await asyncio.wait_for(market.step(DURATION, sim_params={'time': START_TIME + step * DURATION,
+                                                                 'duration': DURATION}), 30)
+    return market._Market__transactions, client.settled
+
+
+def totals(transactions):
+    """Returns the quantities bought and sold by each participant, in physical and in financial transactions"""
+    quantities = collections.Counter()
+    for transaction in transactions:
+        # financial transactions have no time of consumption
+        kind = 'financial' if transaction.time_consumption is None else 'physical'
+        quantities[(transaction.seller_id, kind, 'sold')] += transaction.quantity
+        quantities[(transaction.buyer_id, kind, 'bought')] += transaction.quantity
+    return quantities
+
+
+async def check_netting(n_participants=6, n_steps=20, n_orders=6, seed=0):
+    """Returns the number of settlement messages without and with netting, raises AssertionError on any difference"""
+    rng = random.Random(seed)
+    participant_ids = [f'R{idx}' for idx in range(n_participants)]
+    orders, meters = make_round(participant_ids, n_steps, n_orders, rng)
+
+    transactions, n_settled = await run(orders, meters)
+    netted_transactions, n_netted = await run(orders, meters, net_settlements=True)
+    assert n_netted < n_settled, 'no settlements were netted'
+    assert any(transaction.time_consumption is None for transaction in transactions), 'no financial transactions'
+
+    expected = totals(transactions)
+    netted = totals(netted_transactions)
+    differences = {key: (expected[key], netted[key]) for key in expected.keys() | netted.keys()
+                   if expected[key] != netted[key]}
+    assert not differences, f'quantities differ with netting (without, with): {differences}'
+    return n_settled, n_netted
+
+
+if __name__ == '__main__':
+    n_settled, n_netted = asyncio.run(check_netting())
+    print(f'{n_settled} settlement messages without netting, {n_netted} with netting, '
+          f'same physical and financial quantities for every participant')
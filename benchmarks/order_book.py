@@ -0,0 +1,107 @@
+"""Compares the order book matching engines against the legacy sort-and-scan matching
+
+The legacy engine re-sorted both sides of the book at the end of every round and then walked
+every bid/ask combination, which is O(n*m) regardless of how many pairs actually cross.
+The columnar engine ('matching': 'columnar' in the market configuration) keeps the book in NumPy arrays.
+
+Usage:
+    python -m benchmarks.order_book  (from the repository root)
+"""
+import itertools
+import random
+import time
+from operator import itemgetter
+
+from TREX_Core.markets.base.OrderBook import ColumnarOrderBook, OrderBook
+from TREX_Core.utils import source_classifier
+
+
+def make_orders(n_orders, seed=0):
+    rng = random.Random(seed)
+    bids = []
+    asks = []
+    for idx in range(n_orders):
+        entry = {
+            'id': idx,
+            'participant_id': rng.randrange(n_orders // 2 + 1),
+            'quantity': rng.randint(1, 1000),
+            'price': round(rng.uniform(0.05, 0.15), 4),
+        }
+        if idx % 2:
+            entry['source'] = rng.choice(('solar', 'bess'))
+            asks.append(entry)
+        else:
+            bids.append(entry)
+    return bids, asks
+
+
+def legacy_settle(bid, ask, fills):
+    quantity = min(bid['quantity'], ask['quantity'])
+    bid['quantity'] -= quantity
+    ask['quantity'] -= quantity
+    fills.append((bid['id'], ask['id'], quantity))
+
+
+def settle(bid, ask, fills):
+    quantity = min(bid.quantity, ask.quantity)
+    bid.quantity -= quantity
+    ask.quantity -= quantity
+    fills.append((bid.id, ask.id, quantity))
+
+
+def legacy_match(bids, asks):
+    fills = []
+    asks = sorted([ask for ask in asks if ask['quantity'] > 0], key=itemgetter('price'), reverse=False)
+    bids = sorted([bid for bid in bids if bid['quantity'] > 0], key=itemgetter('price'), reverse=True)
+    for bid, ask in itertools.product(bids, asks):
+        if ask['price'] > bid['price']:
+            continue
+        if bid['participant_id'] == ask['participant_id']:
+            continue
+        if bid['quantity'] <= 0 or ask['quantity'] <= 0:
+            continue
+        legacy_settle(bid, ask, fills)
+    return fills
+
+
+def book_match(book, bids, asks):
+    fills = []
+    for bid in bids:
+        book.add_bid(bid['id'], bid['participant_id'], bid['quantity'], bid['price'], 0)
+    for ask in asks:
+        book.add_ask(ask['id'], ask['participant_id'], ask['quantity'], ask['price'], ask['source'],
+                     source_classifier.source_type_codes[ask['source']], 0)
+    for bid, ask in book.crossing():
+        settle(bid, ask, fills)
+    return fills
+
+
+def order_book_match(bids, asks):
+    return book_match(OrderBook(), bids, asks)
+
+
+def columnar_match(bids, asks):
+    return book_match(ColumnarOrderBook(), bids, asks)
+
+
+def timed(fn, n_orders, repeat=3):
+    best = float('inf')
+    fills = None
+    for _ in range(repeat):
+        bids, asks = make_orders(n_orders)
+        start = time.perf_counter()
+        fills = fn(bids, asks)
+        best = min(best, time.perf_counter() - start)
+    return best, fills
+
+
+if __name__ == '__main__':
+    print(f"{'orders':>8} {'legacy (ms)':>12} {'order book (ms)':>16} {'columnar (ms)':>14} {'fills':>7}")
+    for n_orders in (100, 500, 1000, 2000, 5000, 20000):
+        legacy_s, legacy_fills = timed(legacy_match, n_orders) if n_orders <= 5000 else (float('nan'), None)
+        book_s, book_fills = timed(order_book_match, n_orders)
+        columnar_s, columnar_fills = timed(columnar_match, n_orders)
+        assert legacy_fills in (None, book_fills)
+        assert columnar_fills == book_fills
+        print(f'{n_orders:>8} {legacy_s * 1e3:>12.2f} {book_s * 1e3:>16.2f} {columnar_s * 1e3:>14.2f} '
+              f'{len(book_fills):>7}')
@@ -0,0 +1,47 @@
+"""Compares decoding profile rows one at a time with utils.process_profile against the batch utils.process_profiles
+
+Rows are random eGauge style readings, with some values exactly half way between two integers after scaling,
+so the rounding of both versions is checked as well.
+
+Usage:
+    python -m benchmarks.process_profile  (from the repository root)
+"""
+import time
+
+import numpy as np
+
+from TREX_Core.utils import utils
+
+
+def make_columns(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    solar = rng.uniform(0, 500, n_rows)
+    grid = rng.uniform(-400, 1500, n_rows)
+    # half way values
+    solar[::7] = np.round(solar[::7]) + 0.5
+    grid[::7] = np.round(grid[::7])
+    return {'grid': grid, 'solar': solar - 0.1, 'solar+': solar}
+
+
+def main():
+    gen_scale, load_scale = 1, 0.5
+    print(f"{'rows':>9} {'per row (s)':>12} {'batch (s)':>10}")
+    for n_rows in (100000, 1000000):
+        columns = make_columns(n_rows)
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+        start = time.perf_counter()
+        decoded = [utils.process_profile(row, gen_scale, load_scale) for row in rows]
+        per_row = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generation, consumption = utils.process_profiles(columns, gen_scale, load_scale)
+        batch = time.perf_counter() - start
+
+        assert np.array_equal(generation, [row[0] for row in decoded])
+        assert np.array_equal(consumption, [row[1] for row in decoded])
+        print(f'{n_rows:>9} {per_row:>12.3f} {batch:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compares the memory and throughput of dict records against the __slots__ records used by the market
+
+For every settlement, the market keeps an open bid and ask (Order), the settlement itself (Settlement)
+and the transactions made from it (Transaction), until they are cleaned up or written to the database.
+The dict variant reproduces the records the market used to build, including the copies made during energy exchange.
+
+Usage:
+    python -m benchmarks.records  (from the repository root)
+"""
+import time
+import tracemalloc
+
+from TREX_Core.markets.base.Records import Order, Settlement, Transaction
+
+
+def dict_records(n_settlements):
+    records = []
+    for idx in range(n_settlements):
+        bid = {
+            'id': idx,
+            'participant_id': 'buyer',
+            'quantity': 10,
+            'price': 0.1,
+            'time_submission': idx
+        }
+        ask = {
+            'id': idx,
+            'participant_id': 'seller',
+            'quantity': 10,
+            'price': 0.09,
+            'source': 'solar',
+            'time_submission': idx
+        }
+        record = {
+            'quantity': 10,
+            'seller_id': 'seller',
+            'buyer_id': 'buyer',
+            'energy_source': 'solar',
+            'settlement_price_sell': 0.09,
+            'settlement_price_buy': 0.1,
+            'time_purchase': idx
+        }
+        settlement = {
+            'time_settlement': idx,
+            'source': 'solar',
+            'record': record,
+            'ask': ask,
+            'seller_id': 'seller',
+            'bid': bid,
+            'buyer_id': 'buyer'
+        }
+        transaction = record.copy()
+        transaction.update({
+            'time_creation': idx,
+            'time_consumption': idx
+        })
+        records.append((bid, ask, settlement, transaction))
+    return records
+
+
+def slots_records(n_settlements):
+    records = []
+    for idx in range(n_settlements):
+        bid = Order(idx, 'buyer', 10, 0.1, idx)
+        ask = Order(idx, 'seller', 10, 0.09, idx, 'solar', 1, idx)
+        settlement = Settlement(10, 'seller', 'buyer', 'solar', 0.09, 0.1, idx)
+        transaction = Transaction(10, 'seller', 'buyer', 'solar', 0.09, 0.1, idx, idx, idx)
+        records.append((bid, ask, settlement, transaction))
+    return records
+
+
+def dict_rows(records):
+    return [record[3] for record in records]
+
+
+def slots_rows(records):
+    return [record[3].to_dict() for record in records]
+
+
+def measure(make, rows, n_settlements, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows(make(n_settlements))
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    records = make(n_settlements)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return best, size
+
+
+if __name__ == '__main__':
+    print(f"{'settlements':>12} {'dict (ms)':>10} {'slots (ms)':>11} {'dict (MB)':>10} {'slots (MB)':>11}")
+    for n_settlements in (1000, 10000, 100000, 500000):
+        dict_s, dict_bytes = measure(dict_records, dict_rows, n_settlements)
+        slots_s, slots_bytes = measure(slots_records, slots_rows, n_settlements)
+        print(f'{n_settlements:>12} {dict_s * 1e3:>10.2f} {slots_s * 1e3:>11.2f} '
+              f'{dict_bytes / 2 ** 20:>10.2f} {slots_bytes / 2 ** 20:>11.2f}')